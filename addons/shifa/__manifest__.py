@@ -1,6 +1,6 @@
 {
     'name': 'SHIFA Management',
-    'version': '1.0.0',
+    'version': '1.0.1',
     'summary': 'Membership, Dependents, Medical Assistance & Website form for SHIFA',
     'author': 'Zafir Sk Heerah',
     'category': 'Membership',
@@ -25,9 +25,12 @@
         'views/shifa_committee_views.xml',
         'views/shifa_reporting_views.xml',
         'views/shifa_config_views.xml',
+        'views/shifa_reminder_views.xml',
+        'views/shifa_job_run_views.xml',
         'views/shifa_menu.xml',
         'views/shifa_membership_application_form.xml',
         'views/shifa_membership_application_form_pdf.xml',
+        'views/shifa_meeting_kiosk.xml',
         'views/account_payment_register_views.xml',
         'data/email_templates.xml',
         'data/cron_jobs.xml',
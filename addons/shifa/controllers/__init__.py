@@ -1,2 +1,3 @@
 from . import membership_controller
 
+from . import meeting_controller
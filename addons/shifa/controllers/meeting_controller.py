@@ -0,0 +1,79 @@
+from odoo import http
+from odoo.exceptions import AccessError, ValidationError
+from odoo.http import request
+
+class ShifaMeetingController(http.Controller):
+
+    @http.route(['/shifa/meeting/poll/<int:poll_id>/vote'], type='json', auth='user')
+    def meeting_poll_vote(self, poll_id, choice=None, votes=None, **kw):
+        """Record ballots on an open poll.
+
+        Members vote for themselves with `choice` ('yes', 'no' or 'abstain').
+        The Secretary or Treasurer (e.g. at the AGM desk) can submit a batch as
+        `votes`: [{'member_id': ..., 'choice': ...}].
+        Returns {'recorded': [member ids], 'rejected': [member ids]}.
+        """
+        user = request.env.user
+        if votes is not None:
+            if not (user.has_group('shifa.group_shifa_secretary') or user.has_group('shifa.group_shifa_treasurer')):
+                raise AccessError("Only the Secretary or Treasurer can record votes for other members.")
+            if not isinstance(votes, list):
+                raise ValidationError("votes must be a list of {'member_id', 'choice'}.")
+            pairs = [(vote.get('member_id'), vote.get('choice')) if isinstance(vote, dict) else (vote, None)
+                     for vote in votes]
+        else:
+            member = request.env['shifa.member'].search([('user_id', '=', user.id)], limit=1)
+            if not member:
+                raise AccessError("No member is linked to this account.")
+            pairs = [(member.id, choice)]
+        # No sudo: _record_votes checks the poll state and the attendance in SQL
+        poll = request.env['shifa.meeting.poll'].browse(poll_id)
+        return poll._record_votes(pairs)
+
+    @http.route(['/shifa/meeting/poll/<int:poll_id>/results'], type='json', auth='user')
+    def meeting_poll_results(self, poll_id, **kw):
+        """Current tallies and quorum of a poll (frozen values once it is closed)."""
+        poll = request.env['shifa.meeting.poll'].browse(poll_id).exists()
+        if not poll:
+            raise request.not_found()
+        if poll.state == 'closed':
+            return {
+                'state': poll.state,
+                'yes': poll.yes_count,
+                'no': poll.no_count,
+                'abstain': poll.abstain_count,
+                'total': poll.yes_count + poll.no_count + poll.abstain_count,
+                'attendees': poll.attendee_count,
+                'quorum_reached': poll.quorum_reached,
+            }
+        return dict(poll._get_results()[poll.id], state=poll.state)
+
+    def _get_checkin_meeting(self, meeting_id):
+        if not request.env.user._is_internal():
+            raise AccessError("Only committee users can check members in.")
+        meeting = request.env['shifa.meeting'].browse(meeting_id).exists()
+        if not meeting:
+            raise request.not_found()
+        return meeting
+
+    @http.route(['/shifa/meeting/<int:meeting_id>/kiosk'], type='http', auth='user', website=True)
+    def meeting_kiosk(self, meeting_id, **kw):
+        """Check-in kiosk: scanned national IDs are sent in batches, counts refresh live."""
+        meeting = self._get_checkin_meeting(meeting_id)
+        return request.render('shifa.meeting_kiosk_template', {
+            'meeting': meeting,
+            'status': meeting._get_attendance_status(),
+        })
+
+    @http.route(['/shifa/meeting/<int:meeting_id>/checkin'], type='json', auth='user')
+    def meeting_checkin(self, meeting_id, national_ids=None, **kw):
+        """Check in a batch of scanned national IDs; returns the outcome and the new counts."""
+        meeting = self._get_checkin_meeting(meeting_id)
+        result = meeting._check_in_national_ids(national_ids or [])
+        result['status'] = meeting._get_attendance_status()
+        return result
+
+    @http.route(['/shifa/meeting/<int:meeting_id>/attendance'], type='json', auth='user')
+    def meeting_attendance(self, meeting_id, **kw):
+        """Live attendance and quorum counts of the meeting."""
+        return self._get_checkin_meeting(meeting_id)._get_attendance_status()
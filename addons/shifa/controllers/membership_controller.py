@@ -1,5 +1,7 @@
 from odoo import http
 from odoo.http import request
+from odoo.tools import consteq
+from werkzeug.http import unquote_etag
 
 class ShifaMembershipController(http.Controller):
 
@@ -22,7 +24,8 @@ class ShifaMembershipController(http.Controller):
             'status': 'draft',  # Pending approval
         })
         
-        # Create website user account and get generated password
+        # Create website user account; an invitation to choose a password is mailed,
+        # a password is only generated (and shown) when there is no email address
         generated_passwords = member._create_website_user()
         user_password = generated_passwords.get(member.id)
 
@@ -48,51 +51,94 @@ class ShifaMembershipController(http.Controller):
                 'auto_promote': True if post.get(f'dep_auto_{i}') == 'on' else False,
             })
 
+        # Rendered in the background, ready by the time the applicant downloads it
+        member._queue_membership_pdfs()
+
         return request.render('shifa.membership_application_form_success', {
             'member': member,
-            'user_password': user_password
+            'user_password': user_password,
+            'pdf_url': member._get_membership_pdf_url(),
         })
 
+    @http.route(['/shifa/membership/import'], type='json', auth='user')
+    def membership_import(self, members=None, csv_data=None, chunk_size=200, **kw):
+        """Bulk import members with nested dependents (JSON list or CSV text).
+
+        Runs with the caller's access rights and returns a per-row report.
+        """
+        Member = request.env['shifa.member']
+        if csv_data:
+            return Member.import_members_csv(csv_data, chunk_size=chunk_size)
+        return Member.import_members(members or [], chunk_size=chunk_size)
+
+    def _get_profile_summary(self):
+        """Return (member, etag, summary) of the logged-in member, or (None, None, None)."""
+        # Find the member record linked to this user; a re-application shares the
+        # user of the previous record, prefer the active / most recent one
+        members = request.env['shifa.member'].search([('user_id', '=', request.env.user.id)])
+        member = members.sorted(lambda m: (m.status == 'active', m.id))[-1:]
+        if not member:
+            return None, None, None
+        version, summary = member._get_portal_summary()
+        return member, f'"{version}-{request.lang.code}"', summary
+
+    def _not_modified(self, etag):
+        """True when If-None-Match lists this entity tag (weak comparison, '*' matches any)."""
+        tag, _weak = unquote_etag(etag)
+        return request.httprequest.if_none_match.contains_weak(tag)
+
     @http.route(['/shifa/profile'], type='http', auth='user', website=True)
     def member_profile(self, **kw):
-        """Display member profile for logged-in users"""
-        user = request.env.user
-        
-        # Find the member record linked to this user
-        member = request.env['shifa.member'].search([('user_id', '=', user.id)], limit=1)
-        
+        """Display member profile for logged-in users (cached summary, ETag/304 aware)"""
+        member, etag, summary = self._get_profile_summary()
         if not member:
             # If no member record found, redirect to membership form
             return request.redirect('/shifa/membership')
-        
-        # Get recent invoices for this member
-        invoices = request.env['account.move'].search([
-            ('partner_id', '=', member.partner_id.id),
-            ('move_type', '=', 'out_invoice'),
-            ('state', '=', 'posted')
-        ], order='invoice_date desc', limit=10)
-        
-        return request.render('shifa.member_profile_template', {
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+        if self._not_modified(etag):
+            return request.make_response('', headers=headers, status=304)
+
+        response = request.render('shifa.member_profile_template', {
             'member': member,
-            'invoices': invoices
+            'summary': summary,
         })
+        response.headers.update(headers)
+        return response
 
-    @http.route(['/shifa/membership/pdf/<int:member_id>'], type='http', auth='public', website=True)
-    def membership_pdf_download(self, member_id, **kw):
-        # Fetch the report action (as a string ref)
-        report_ref = 'shifa.action_report_membership_application_pdf'
+    @http.route(['/shifa/profile/summary.json'], type='http', auth='user', methods=['GET'])
+    def member_profile_summary(self, **kw):
+        """Lightweight JSON variant of the profile: member info, dependents, invoices and amount due."""
+        member, etag, summary = self._get_profile_summary()
+        if not member:
+            return request.not_found()
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+        if self._not_modified(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_json_response(summary, headers=headers)
 
-        # Get the report object
-        report = request.env.ref(report_ref).sudo()
+    def _can_access_membership_pdf(self, member, access_token=None):
+        """The applicant (signed token or own account) and internal users can read an application."""
+        if access_token:
+            return consteq(access_token, member._get_membership_pdf_token())
+        user = request.env.user
+        if user._is_public():
+            return False
+        return user._is_internal() or member.user_id == user
 
-        # Proper call: pass the report_ref and res_ids explicitly
-        pdf_content, _ = report.with_context(disable_javascript=True)._render_qweb_pdf(
-            report_ref, res_ids=[member_id]
-        )
+    @http.route(['/shifa/membership/pdf/<int:member_id>'], type='http', auth='public', website=True)
+    def membership_pdf_download(self, member_id, access_token=None, **kw):
+        member = request.env['shifa.member'].sudo().browse(member_id).exists()
+        if not member or not self._can_access_membership_pdf(member, access_token):
+            raise request.not_found()
 
-        pdf_name = f"membership_{member_id}.pdf"
-        headers = [
-            ('Content-Type', 'application/pdf'),
-            ('Content-Disposition', f'inline; filename={pdf_name}')
-        ]
-        return request.make_response(pdf_content, headers)
+        # Only served from the cached attachment: a stale PDF is rendered by the
+        # background renderer, wkhtmltopdf never runs in the request
+        attachment = member._get_membership_pdf_attachments(render=False).get(member.id)
+        if not attachment:
+            member._queue_membership_pdfs()
+            return request.render('shifa.membership_pdf_pending', {'member': member},
+                                  status=202, headers=[('Retry-After', '60')])
+        stream = request.env['ir.binary']._get_stream_from(
+            attachment, 'raw', filename=f"membership_{member_id}.pdf", mimetype='application/pdf',
+        )
+        return stream.get_response(as_attachment=False)
@@ -1,6 +1,12 @@
+from . import job_run
 from . import member
 from . import dependent
 from . import medical_assistance
+from . import account_move
 from . import account_payment_register
 from . import committee
 from . import meeting
+from . import reminder
+from . import query_audit
+from . import arrears_aging
+from . import membership_analytics
@@ -0,0 +1,11 @@
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _compute_payment_state(self):
+        super()._compute_payment_state()
+        # Payments and postings change the arrears of members: drop the eligibility
+        # snapshots cached for this transaction (see shifa.member._get_eligibility_snapshot)
+        self.env.cr.precommit.data.pop('shifa.eligibility_snapshot', None)
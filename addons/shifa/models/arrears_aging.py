@@ -0,0 +1,75 @@
+from odoo import api, fields, models, tools
+from odoo.tools import SQL
+
+# One member per partner: the active one if any, else the most recent. Reports
+# aggregating invoices (joined on partner_id) attribute them to this member only.
+PARTNER_MEMBER_QUERY = SQL("""
+    SELECT DISTINCT ON (partner_id) *
+      FROM shifa_member
+     WHERE partner_id IS NOT NULL
+  ORDER BY partner_id, status = 'active' DESC, id DESC
+""")
+
+
+class ShifaArrearsAging(models.Model):
+    """Amounts due per member, split in overdue buckets (SQL view).
+
+    Aggregates the open customer invoices of each member's partner, the same
+    invoices the arrears engine looks at (see _unpaid_invoice_domain), so the
+    report groups and pivots in the database. Several members can share a
+    partner (e.g. a re-application next to a terminated record): the invoices
+    are reported once, on the partner's representative member (see
+    PARTNER_MEMBER_QUERY).
+    """
+    _name = 'shifa.arrears.aging'
+    _description = 'SHIFA Arrears Aging'
+    _auto = False
+    _rec_name = 'member_id'
+    _order = 'overdue_days desc, member_id'
+
+    member_id = fields.Many2one('shifa.member', string='Member', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Partner', readonly=True)
+    member_status = fields.Selection(lambda self: self.env['shifa.member']._fields['status'].selection,
+                                     string='Member Status', readonly=True)
+    payment_state = fields.Selection(lambda self: self.env['shifa.member']._fields['payment_state'].selection,
+                                     string='Payment State', readonly=True)
+    currency_id = fields.Many2one('res.currency', readonly=True)
+    invoice_count = fields.Integer(string='Open Invoices', readonly=True)
+    oldest_due_date = fields.Date(string='Oldest Due Date', readonly=True)
+    overdue_days = fields.Integer(string='Days Overdue', readonly=True, aggregator='max')
+    amount_not_due = fields.Monetary(string='Not Yet Due', readonly=True)
+    amount_0_30 = fields.Monetary(string='0-30 Days', readonly=True)
+    amount_31_90 = fields.Monetary(string='31-90 Days', readonly=True)
+    amount_90_plus = fields.Monetary(string='90+ Days', readonly=True)
+    amount_due = fields.Monetary(string='Total Due', readonly=True)
+
+    @api.model
+    def _query(self):
+        due = SQL("CURRENT_DATE - COALESCE(am.invoice_date_due, am.invoice_date)")
+        return SQL("""
+            SELECT m.id AS id,
+                   m.id AS member_id,
+                   m.partner_id AS partner_id,
+                   m.status AS member_status,
+                   m.payment_state AS payment_state,
+                   m.currency_id AS currency_id,
+                   COUNT(am.id) AS invoice_count,
+                   MIN(COALESCE(am.invoice_date_due, am.invoice_date)) AS oldest_due_date,
+                   GREATEST(MAX(%(due)s), 0) AS overdue_days,
+                   COALESCE(SUM(am.amount_residual_signed) FILTER (WHERE %(due)s < 0), 0) AS amount_not_due,
+                   COALESCE(SUM(am.amount_residual_signed) FILTER (WHERE %(due)s BETWEEN 0 AND 30), 0) AS amount_0_30,
+                   COALESCE(SUM(am.amount_residual_signed) FILTER (WHERE %(due)s BETWEEN 31 AND 90), 0) AS amount_31_90,
+                   COALESCE(SUM(am.amount_residual_signed) FILTER (WHERE %(due)s > 90), 0) AS amount_90_plus,
+                   SUM(am.amount_residual_signed) AS amount_due
+              FROM (%(partner_members)s) m
+              JOIN account_move am
+                ON am.partner_id = m.partner_id
+               AND am.move_type = 'out_invoice'
+               AND am.state = 'posted'
+               AND am.payment_state IS DISTINCT FROM 'paid'
+          GROUP BY m.id, m.partner_id, m.status, m.payment_state, m.currency_id
+        """, due=due, partner_members=PARTNER_MEMBER_QUERY)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(SQL("CREATE OR REPLACE VIEW %s AS (%s)", SQL.identifier(self._table), self._query()))
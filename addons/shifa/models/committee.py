@@ -1,5 +1,10 @@
 from odoo import api, fields, models, _
 from datetime import date
+from dateutil.relativedelta import relativedelta
+from .job_run import tracked_job
+
+# Article 5.1: committee roles are held for at most 5 years
+TENURE_YEARS = 5
 
 class ShifaCommitteeRole(models.Model):
     _name = 'shifa.committee.role'
@@ -12,13 +17,31 @@ class ShifaCommitteeRole(models.Model):
 class ShifaCommitteeMember(models.Model):
     _name = 'shifa.committee.member'
     _description = 'SHIFA Committee Member'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'mail.activity.mixin']
 
-    member_id = fields.Many2one('shifa.member', required=True, string="Member")
+    member_id = fields.Many2one('shifa.member', required=True, string="Member", index=True)
     role_id = fields.Many2one('shifa.committee.role', required=True, string="Role")
     start_date = fields.Date(required=True, default=fields.Date.today)
     end_date = fields.Date()
     active = fields.Boolean(default=True)
+    tenure_expiry_date = fields.Date(
+        string="Tenure Expiry", compute='_compute_tenure_expiry_date', store=True, index=True,
+        help="Date the role reaches the maximum tenure of %s years" % TENURE_YEARS,
+    )
+    tenure_review_scheduled = fields.Boolean(
+        copy=False, help="A review activity was scheduled for the current tenure",
+    )
+
+    @api.depends('start_date')
+    def _compute_tenure_expiry_date(self):
+        for rec in self:
+            rec.tenure_expiry_date = rec.start_date and rec.start_date + relativedelta(years=TENURE_YEARS)
+
+    def write(self, vals):
+        # A new start date opens a new tenure, which gets its own review
+        if 'start_date' in vals and 'tenure_review_scheduled' not in vals:
+            vals = dict(vals, tenure_review_scheduled=False)
+        return super().write(vals)
 
     @api.constrains('start_date', 'end_date')
     def _check_dates(self):
@@ -26,17 +49,46 @@ class ShifaCommitteeMember(models.Model):
             if rec.end_date and rec.start_date > rec.end_date:
                 raise models.ValidationError(_('Start Date must be before End Date.'))
 
+    @api.model
+    @tracked_job('Committee Tenure Check')
     def check_expiration(self):
-        """Check if role has expired (5 years max per rules)."""
+        """Flag roles past their tenure and close roles past their end date (daily cron).
+
+        Both selections are one query on indexed dates. A role gets a single
+        review activity per tenure (tenure_review_scheduled), so running the
+        check again does not duplicate activities.
+        """
+        today = fields.Date.today()
+        expired = self.search([
+            ('tenure_expiry_date', '<=', today),
+            ('tenure_review_scheduled', '=', False),
+        ])
+        if expired:
+            expired.activity_schedule(
+                'mail.mail_activity_data_todo',
+                date_deadline=today,
+                user_id=self.env.user.id,
+                note=_('Committee member tenure has exceeded %s years. Please review.', TENURE_YEARS),
+            )
+            expired.write({'tenure_review_scheduled': True})
+        ended = self.search([('end_date', '<', today)])
+        if ended:
+            ended.write({'active': False})
+        self.env['shifa.job.run']._add_counts(scanned=len(expired) + len(ended), changed=len(expired) + len(ended))
+
+    @tracked_job('Close Committee Tenures')
+    def action_close_tenure(self):
+        """Close the selected roles whose tenure has expired, ending them on their expiry date.
+
+        Roles are written per expiry date rather than one by one; archiving
+        also removes their pending review activities.
+        """
         today = fields.Date.today()
-        for rec in self.search([('active', '=', True)]):
-            # Article 5.1: Role expiration every 5 years
-            # We can either auto-expire or just flag it. Let's flag it via activity.
-            if rec.start_date:
-                years = (today - rec.start_date).days / 365.0
-                if years >= 5:
-                    rec.activity_schedule(
-                        'mail.mail_activity_data_todo',
-                        user_id=self.env.user.id,
-                        note=_('Committee member tenure has exceeded 5 years. Please review.')
-                    )
+        expired = self.filtered(lambda r: r.active and r.tenure_expiry_date and r.tenure_expiry_date <= today)
+        by_date = {}
+        for rec in expired:
+            by_date.setdefault(rec.tenure_expiry_date, self.browse())
+            by_date[rec.tenure_expiry_date] |= rec
+        for end_date, records in by_date.items():
+            records.write({'end_date': end_date, 'active': False})
+        self.env['shifa.job.run']._add_counts(scanned=len(self), changed=len(expired))
@@ -1,4 +1,36 @@
 from odoo import api, fields, models
+from dateutil.relativedelta import relativedelta
+from .job_run import tracked_job
+
+# Age at which a dependent stops being covered unless care-dependent
+MAX_DEPENDENT_AGE = 23
+# Fields the eligibility of a dependent depends on (re-validated when written)
+ELIGIBILITY_FIELDS = {'relation', 'date_of_birth', 'is_care_dependent', 'approval_state', 'subscription_state'}
+
+
+def _age_on(date_of_birth, on_date):
+    """Age in completed years on `on_date` (leap-year aware, unlike days // 365)."""
+    return relativedelta(on_date, date_of_birth).years
+
+
+AGE_GROUPS = [
+    ('under_14', 'Under 14'),
+    ('14_18', '14–18'),
+    ('18_23', '18–23'),
+    ('23_plus', '23+'),
+]
+# (age the band ends at, band); ages from 23 on are '23_plus'
+AGE_GROUP_LIMITS = [(14, 'under_14'), (18, '14_18'), (MAX_DEPENDENT_AGE, '18_23')]
+
+
+def _age_group_on(date_of_birth, on_date):
+    """Return (age group, date of the next age group change) on `on_date`."""
+    age = _age_on(date_of_birth, on_date)
+    for limit, age_group in AGE_GROUP_LIMITS:
+        if age < limit:
+            return age_group, date_of_birth + relativedelta(years=limit)
+    return '23_plus', False
+
 
 class ShifaDependent(models.Model):
     _name = 'shifa.dependent'
@@ -15,7 +47,7 @@ class ShifaDependent(models.Model):
 
     date_of_birth = fields.Date()
     id_number = fields.Char(string='ID Number')
-    member_id = fields.Many2one('shifa.member', required=True, ondelete='cascade')
+    member_id = fields.Many2one('shifa.member', required=True, ondelete='cascade', index=True)
     # Use a new name to avoid DB column type conflicts if an older boolean column 'approved' exists
     approval_state = fields.Selection([('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', tracking=True)
 
@@ -24,7 +56,13 @@ class ShifaDependent(models.Model):
     is_orphan = fields.Boolean(string="Orphan")
 
     # Age grouping
-    age_group = fields.Char(compute='_compute_age_group', store=False)
+    age_group = fields.Selection(AGE_GROUPS, compute='_compute_age_group', store=True, index=True)
+    next_age_group_date = fields.Date(
+        string="Next Age Group Change", compute='_compute_age_group', store=True, index=True,
+        help="Date the dependent moves to the next age group (refreshed daily)")
+    age_transition_date = fields.Date(
+        string="Next Age Transition", compute='_compute_age_transition_date', store=True, index=True,
+        help="Date the dependent turns 23 and is unsubscribed unless care-dependent")
 
     # Subscription state & flow
     subscription_state = fields.Selection([
@@ -38,39 +76,64 @@ class ShifaDependent(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super(ShifaDependent, self).create(vals_list)
-        # Validate each created record
-        for rec in records:
-            rec._validate_eligibility()
+        # Validate the created records in one pass
+        if not self.env.context.get('shifa_skip_dependent_validation'):
+            records._validate_eligibility()
         return records
 
     def write(self, vals):
         res = super(ShifaDependent, self).write(vals)
-        # Validate current records after write
-        for rec in self:
-            rec._validate_eligibility()
+        # Validate current records after write, unless written by the validation itself
+        if ELIGIBILITY_FIELDS.intersection(vals) and not self.env.context.get('shifa_skip_dependent_validation'):
+            self._validate_eligibility()
         return res
 
     def _validate_eligibility(self):
+        """Unsubscribe child dependents over the age limit (and reject them if still pending).
+
+        The age limit is turned into one birth date cutoff for the whole
+        recordset, and the changes are applied with at most one write per
+        resulting state; those writes do not trigger the validation again.
+        """
+        # Example rule: child dependents over 23 (and not care-dependent) cannot be approved
+        cutoff = fields.Date.today() - relativedelta(years=MAX_DEPENDENT_AGE + 1)
+        to_reject, to_unsubscribe = [], []
+        for dep in self:
+            if dep.relation == 'child' and dep.date_of_birth and not dep.is_care_dependent and dep.date_of_birth <= cutoff:
+                # keep approved state as rejected if previously pending
+                if dep.approval_state == 'pending':
+                    to_reject.append(dep.id)
+                elif dep.subscription_state != 'unsubscribed':
+                    to_unsubscribe.append(dep.id)
+        guarded = self.with_context(shifa_skip_dependent_validation=True)
+        if to_reject:
+            guarded.browse(to_reject).write({'subscription_state': 'unsubscribed', 'approval_state': 'rejected'})
+        if to_unsubscribe:
+            guarded.browse(to_unsubscribe).write({'subscription_state': 'unsubscribed'})
+
+    @api.depends('date_of_birth')
+    def _compute_age_transition_date(self):
         for dep in self:
-            # Example rule: child dependents over 23 (and not care-dependent) cannot be approved
-            if dep.relation == 'child' and dep.date_of_birth and not dep.is_care_dependent:
-                age = (fields.Date.today() - dep.date_of_birth).days // 365
-                if age > 23:
-                    dep.subscription_state = 'unsubscribed'
-                    # keep approved state as rejected if previously pending
-                    if dep.approval_state == 'pending':
-                        dep.approval_state = 'rejected'
+            dep.age_transition_date = dep.date_of_birth + relativedelta(years=MAX_DEPENDENT_AGE) if dep.date_of_birth else False
 
     @api.depends('date_of_birth')
     def _compute_age_group(self):
+        # Stored as of the computation date; cron_refresh_age_groups moves dependents on as they age
+        today = fields.Date.today()
         for dep in self:
             if not dep.date_of_birth:
-                dep.age_group = 'Unknown'
+                dep.age_group = False
+                dep.next_age_group_date = False
                 continue
-            age = (fields.Date.today() - dep.date_of_birth).days // 365
-            if age < 14:
-                dep.age_group = 'Under 14'
-            elif age <= 18:
-                dep.age_group = '14–18'
-            else:
-                dep.age_group = '18+'
+            dep.age_group, dep.next_age_group_date = _age_group_on(dep.date_of_birth, today)
+
+    @api.model
+    @tracked_job('Refresh Dependent Age Groups')
+    def cron_refresh_age_groups(self):
+        """Recompute the age group of the dependents whose group changes today (or was missed)."""
+        due = self.search([('next_age_group_date', '<=', fields.Date.today())])
+        if due:
+            self.env.add_to_compute(self._fields['age_group'], due)
+            self.env.add_to_compute(self._fields['next_age_group_date'], due)
+            due.flush_recordset(['age_group', 'next_age_group_date'])
+        self.env['shifa.job.run']._add_counts(scanned=len(due), changed=len(due))
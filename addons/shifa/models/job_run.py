@@ -0,0 +1,131 @@
+from odoo import api, fields, models
+from contextlib import contextmanager
+from datetime import timedelta
+import functools
+import logging
+import threading
+import time
+import traceback
+
+_logger = logging.getLogger(__name__)
+
+# Runs in progress on this thread; nested tracked calls report into the outermost one
+_active_runs = threading.local()
+
+
+def tracked_job(label):
+    """Record each call of the decorated method as a shifa.job.run.
+
+    The method can report its counts with env['shifa.job.run']._add_counts().
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.env['shifa.job.run']._track(f'{self._name}.{method.__name__}', label):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ShifaJobRun(models.Model):
+    """One execution of a SHIFA cron or bulk action, with its cost."""
+    _name = 'shifa.job.run'
+    _description = 'SHIFA Job Run'
+    _order = 'date_start desc, id desc'
+
+    name = fields.Char(string='Job', required=True, readonly=True)
+    job_key = fields.Char(required=True, readonly=True, index=True)
+    state = fields.Selection([
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], default='done', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', readonly=True)
+    date_start = fields.Datetime(string='Started', required=True, readonly=True, index=True)
+    date_end = fields.Datetime(string='Ended', readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True, aggregator='avg')
+    query_count = fields.Integer(string='SQL Queries', readonly=True, aggregator='avg')
+    records_scanned = fields.Integer(readonly=True)
+    records_changed = fields.Integer(readonly=True)
+    mails_queued = fields.Integer(readonly=True)
+    message = fields.Text(readonly=True)
+
+    @contextmanager
+    def _track(self, job_key, label):
+        """Context manager recording the enclosed work as one job run.
+
+        A successful run is written in the job's own transaction, once the work
+        is done. A failed run is written with a separate cursor, so it is kept
+        when the job's transaction rolls back.
+        """
+        stack = _active_runs.__dict__.setdefault('stack', [])
+        if stack:
+            yield stack[-1]
+            return
+
+        cr = self.env.cr
+        stats = {'scanned': 0, 'changed': 0, 'mails': 0, 'messages': []}
+        vals = {
+            'name': label,
+            'job_key': job_key,
+            'user_id': self.env.uid,
+            'date_start': fields.Datetime.now(),
+        }
+        queries_before = cr.sql_log_count
+        started = time.monotonic()
+        stack.append(stats)
+        try:
+            yield stats
+        except Exception:
+            stats['messages'].append(traceback.format_exc())
+            vals.update(self._run_result_vals(stats, 'failed', started, cr.sql_log_count - queries_before))
+            self._write_failed_run(vals)
+            raise
+        finally:
+            stack.pop()
+        vals.update(self._run_result_vals(stats, 'done', started, cr.sql_log_count - queries_before))
+        self.sudo().create(vals)
+        _logger.info(
+            "SHIFA job %s: %.1fs, %s queries, %s scanned, %s changed, %s mail(s) queued",
+            label, vals['duration'], vals['query_count'], stats['scanned'], stats['changed'], stats['mails'],
+        )
+
+    @api.model
+    def _run_result_vals(self, stats, state, started, queries):
+        return {
+            'state': state,
+            'date_end': fields.Datetime.now(),
+            'duration': time.monotonic() - started,
+            'query_count': queries,
+            'records_scanned': stats['scanned'],
+            'records_changed': stats['changed'],
+            'mails_queued': stats['mails'],
+            'message': '\n'.join(stats['messages']) or False,
+        }
+
+    @api.model
+    def _write_failed_run(self, vals):
+        """Record a failed run in its own transaction (the job's one is rolled back)."""
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr, su=True)['shifa.job.run'].create(vals)
+        except Exception:
+            # Bookkeeping must never hide the error of the job itself
+            _logger.exception("SHIFA: could not record failed job run %s", vals['name'])
+
+    @api.model
+    def _add_counts(self, scanned=0, changed=0, mails=0, message=None):
+        """Add to the counts of the job run in progress, if any."""
+        stack = getattr(_active_runs, 'stack', None)
+        if not stack:
+            return
+        stats = stack[-1]
+        stats['scanned'] += scanned
+        stats['changed'] += changed
+        stats['mails'] += mails
+        if message:
+            stats['messages'].append(message)
+
+    @api.autovacuum
+    def _gc_job_runs(self):
+        """Keep 180 days of job history."""
+        self.sudo().search([('date_start', '<', fields.Datetime.now() - timedelta(days=180))]).unlink()
@@ -1,12 +1,13 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from odoo.exceptions import ValidationError
+from .job_run import tracked_job
 
 class ShifaMedicalAssistance(models.Model):
     _name = 'shifa.medical_assistance'
     _description = 'SHIFA Medical Assistance'
     _inherit = ['mail.thread', 'mail.activity.mixin']
 
-    member_id = fields.Many2one('shifa.member', required=True)
+    member_id = fields.Many2one('shifa.member', required=True, index=True)
     dependent_id = fields.Many2one('shifa.dependent')
     claim_type = fields.Selection([
         ('hospital', 'Hospital'),
@@ -32,70 +33,137 @@ class ShifaMedicalAssistance(models.Model):
     is_fundraising_appeal = fields.Boolean(string="Fundraising Appeal")
     fundraising_notes = fields.Text(string="Fundraising Details")
 
-    @api.model
-    def create(self, vals):
-        rec = super(ShifaMedicalAssistance, self).create(vals)
-        rec._check_eligibility_on_create()
-        return rec
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(ShifaMedicalAssistance, self).create(vals_list)
+        records._check_eligibility_on_create()
+        years = {rec.decision_date.year for rec in records if rec.state == 'approved' and rec.decision_date}
+        self.env['shifa.medical.fund.ledger']._recompute_years(years)
+        return records
 
     def write(self, vals):
+        ledger_fields = {'state', 'approved_amount', 'decision_date'}
+        years = set()
+        if ledger_fields.intersection(vals) and not self.env.context.get('shifa_ledger_locked'):
+            years = {rec.decision_date.year for rec in self if rec.state == 'approved' and rec.decision_date}
         res = super(ShifaMedicalAssistance, self).write(vals)
-        for rec in self:
-            rec._check_eligibility_on_create()
+        # Only re-validate when the claim changes hands or gets approved, not on edits of remarks etc.
+        if 'member_id' in vals or vals.get('state') == 'approved':
+            self._check_eligibility_on_create()
+        if ledger_fields.intersection(vals) and not self.env.context.get('shifa_ledger_locked'):
+            # Edits outside action_approve: bring the affected ledgers back in line with the claims
+            years |= {rec.decision_date.year for rec in self if rec.state == 'approved' and rec.decision_date}
+            self.env['shifa.medical.fund.ledger']._recompute_years(years)
+        return res
+
+    def unlink(self):
+        years = {rec.decision_date.year for rec in self if rec.state == 'approved' and rec.decision_date}
+        res = super(ShifaMedicalAssistance, self).unlink()
+        self.env['shifa.medical.fund.ledger']._recompute_years(years)
         return res
 
     def _check_eligibility_on_create(self):
         """Enforce: member must have been active for >= 2 years and not have arrears > 90 days."""
+        snapshots = self.member_id._get_eligibility_snapshot()
         for rec in self:
-            member = rec.member_id
-            if not member:
+            snapshot = snapshots.get(rec.member_id.id)
+            if not snapshot:
                 continue
+            if not snapshot['tenure_met']:
+                raise ValidationError('Member does not meet the 2-year qualifying period for medical assistance.')
+            if snapshot['overdue_days'] > 90:
+                raise ValidationError('Member has arrears exceeding 90 days and is not eligible for medical assistance.')
 
-            # Check membership tenure
-            if member.membership_start_date:
-                try:
-                    start = fields.Date.from_string(member.membership_start_date)
-                except Exception:
-                    start = None
-                if start:
-                    years = (fields.Date.today() - start).days // 365
-                    if years < 2:
-                        raise ValidationError('Member does not meet the 2-year qualifying period for medical assistance.')
-
-            # Check arrears > 90 days via invoices
-            today = fields.Date.today()
-            if member.partner_id:
-                invoices = self.env['account.move'].search([
-                    ('partner_id', '=', member.partner_id.id),
-                    ('move_type', '=', 'out_invoice'),
-                    ('state', '=', 'posted'),
-                    ('payment_state', '!=', 'paid'),
-                ])
-                for inv in invoices:
-                    due = inv.invoice_date_due or inv.invoice_date
-                    if due and (today - due).days > 90:
-                        raise ValidationError('Member has arrears exceeding 90 days and is not eligible for medical assistance.')
-
+    @tracked_job('Approve Medical Assistance')
     def action_approve(self):
-        # enforce 50% annual disbursement limit and mark approved amount
+        """Approve the claims, enforcing the 50% annual disbursement limit.
+
+        The fiscal year's ledger row is locked first, so concurrent approvals are
+        serialized and cannot both pass the limit. Several claims can be approved
+        at once; the limit then applies to their total. Claims that are not
+        pending are left as they are, so they are never counted twice.
+        """
+        claims = self.filtered(lambda c: c.state == 'draft')
+        if not claims:
+            return
         cfg = self.env['shifa.config'].sudo().get_settings()
         if not cfg:
             raise ValidationError('SHIFA configuration is not set. Please configure medical fund settings.')
         cfg = cfg[0]
 
-        # compute current year disbursed
-        start_year = fields.Date.from_string(fields.Date.today()).replace(month=1, day=1)
-        disbursed = sum(rec.approved_amount for rec in self.search([('state', '=', 'approved'), ('decision_date', '>=', start_year)]))
-        available = (cfg.medical_fund_amount or 0.0) * 0.5 - disbursed
-        if (self.approved_amount or 0.0) > available:
+        today = fields.Date.today()
+        ledger = self.env['shifa.medical.fund.ledger']._lock_year(today.year)
+        requested = sum(rec.approved_amount or 0.0 for rec in claims)
+        available = (cfg.medical_fund_amount or 0.0) * 0.5 - ledger.disbursed_amount
+        if requested > available:
             raise ValidationError('Approving this amount would exceed the 50% annual disbursement limit.')
 
-        self.write({'state': 'approved', 'decision_date': fields.Date.today()})
+        claims.with_context(shifa_ledger_locked=True).write({'state': 'approved', 'decision_date': today})
+        ledger.disbursed_amount += requested
+        self.env['shifa.job.run']._add_counts(scanned=len(self), changed=len(claims))
 
     def action_reject(self):
         self.write({'state': 'rejected', 'decision_date': fields.Date.today()})
 
 
+class ShifaMedicalFundLedger(models.Model):
+    """Running total of medical assistance approved per fiscal (calendar) year."""
+    _name = 'shifa.medical.fund.ledger'
+    _description = 'SHIFA Medical Fund Ledger'
+    _order = 'fiscal_year desc'
+    _rec_name = 'fiscal_year'
+
+    fiscal_year = fields.Integer(required=True, readonly=True)
+    disbursed_amount = fields.Monetary(string='Disbursed', readonly=True)
+    currency_id = fields.Many2one('res.currency', default=lambda s: s.env.company.currency_id)
+
+    _sql_constraints = [
+        ('fiscal_year_uniq', 'unique(fiscal_year)', 'There is already a ledger for this fiscal year.'),
+    ]
+
+    @api.model
+    def _disbursed_by_year(self, years):
+        """Sum the approved claims of the given years, in one grouped query."""
+        if not years:
+            return {}
+        groups = self.env['shifa.medical_assistance'].sudo()._read_group([
+            ('state', '=', 'approved'),
+            ('decision_date', '>=', fields.Date.to_date(f'{min(years)}-01-01')),
+            ('decision_date', '<=', fields.Date.to_date(f'{max(years)}-12-31')),
+        ], groupby=['decision_date:year'], aggregates=['approved_amount:sum'])
+        return {year.year: amount for year, amount in groups}
+
+    @api.model
+    def _lock_year(self, year):
+        """Return the ledger of `year`, created if needed and locked until the end of the transaction."""
+        self.env.cr.execute("SELECT id FROM shifa_medical_fund_ledger WHERE fiscal_year = %s FOR UPDATE", [year])
+        row = self.env.cr.fetchone()
+        if not row:
+            # Seed from the claims already approved this year; ON CONFLICT covers a concurrent seed
+            self.env.cr.execute("""
+                INSERT INTO shifa_medical_fund_ledger
+                    (fiscal_year, disbursed_amount, currency_id, create_uid, write_uid, create_date, write_date)
+                VALUES (%s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+                ON CONFLICT (fiscal_year) DO NOTHING
+            """, [year, self._disbursed_by_year([year]).get(year, 0.0),
+                  self.env.company.currency_id.id, self.env.uid, self.env.uid])
+            self.env.cr.execute("SELECT id FROM shifa_medical_fund_ledger WHERE fiscal_year = %s FOR UPDATE", [year])
+            row = self.env.cr.fetchone()
+        ledger = self.sudo().browse(row[0])
+        ledger.invalidate_recordset()
+        return ledger
+
+    @api.model
+    def _recompute_years(self, years):
+        """Reset the ledgers of `years` to the sum of their approved claims."""
+        years = {year for year in years if year}
+        if not years:
+            return
+        totals = self._disbursed_by_year(years)
+        for year in years:
+            self._lock_year(year).disbursed_amount = totals.get(year, 0.0)
+
+
 class ShifaConfig(models.Model):
     _name = 'shifa.config'
     _description = 'SHIFA Configuration'
@@ -103,11 +171,45 @@ class ShifaConfig(models.Model):
     medical_fund_amount = fields.Monetary(string='Medical Fund Total', currency_field='currency_id')
     currency_id = fields.Many2one('res.currency', default=lambda s: s.env.company.currency_id)
     committee_notification_emails = fields.Char(string="Committee Notification Emails", help="Comma-separated emails for Treasurer/Secretary")
+    reminder_interval_days = fields.Integer(string="Days Between Reminders", default=7, help="A member is not reminded again within this many days")
+    reminder_send_cap = fields.Integer(string="Reminders per Run", default=500, help="Maximum number of reminder mails queued per run (0 = no limit)")
+    arrears_notification_mode = fields.Selection([
+        ('digest', 'One Digest per Run'),
+        ('member', 'One Email per Member'),
+    ], string="Arrears Notifications", default='digest', required=True,
+        help="How the Treasurer and Secretary are told about members suspended for arrears")
 
     @api.model
     def get_settings(self):
         return self.search([], limit=1)
 
+    @api.model
+    def _get_committee_emails(self):
+        """Comma-separated recipients of committee notifications: the configured
+        emails, else the Treasurer and Secretary group users."""
+        cfg = self.sudo().get_settings()
+        if cfg and cfg.committee_notification_emails:
+            return cfg.committee_notification_emails
+        partners = self.env['res.partner'].sudo().browse(self._get_committee_partner_ids())
+        return ','.join(partner.email for partner in partners if partner.email)
+
+    @api.model
+    def _get_treasurer_emails(self):
+        """Comma-separated emails of the Treasurer group users (renewal summaries)."""
+        group = self.env.ref('shifa.group_shifa_treasurer', raise_if_not_found=False)
+        if not group:
+            return ''
+        return ','.join(email for email in group.sudo().users.partner_id.mapped('email') if email)
+
+    @api.model
+    @tools.ormcache()
+    def _get_committee_partner_ids(self):
+        """Partners of the Treasurer and Secretary users; the cache is cleared when group membership changes."""
+        groups = self.env['res.groups'].sudo()
+        for xmlid in ('shifa.group_shifa_treasurer', 'shifa.group_shifa_secretary'):
+            groups |= self.env.ref(xmlid, raise_if_not_found=False) or groups.browse()
+        return tuple(groups.users.partner_id.ids)
+
     @api.model
     def setup_journal_accounts(self):
         """Configure Juice journal outstanding accounts (called via data XML)."""
@@ -1,4 +1,13 @@
 from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+import math
+
+BALLOT_CHOICES = [
+    ('yes', 'Yes'),
+    ('no', 'No'),
+    ('abstain', 'Abstain'),
+]
 
 class ShifaMeeting(models.Model):
     _name = 'shifa.meeting'
@@ -26,14 +35,116 @@ class ShifaMeeting(models.Model):
     
     attendee_ids = fields.Many2many('shifa.member', string="Attendees")
     attendance_count = fields.Integer(compute='_compute_attendance_count')
+    quorum_percent = fields.Float(string="Quorum (%)", default=0.0,
+                                  help="Share of the active members that must attend for the meeting and its "
+                                       "polls to be quorate (0 = no quorum required)")
 
     # Voting / Polls
     poll_ids = fields.One2many('shifa.meeting.poll', 'meeting_id', string="Polls/Votes")
 
     @api.depends('attendee_ids')
     def _compute_attendance_count(self):
+        # Count in the database instead of loading the attendees (new records are counted in memory)
+        counts = self.filtered(lambda m: isinstance(m.id, int))._get_attendee_counts()
         for rec in self:
-            rec.attendance_count = len(rec.attendee_ids)
+            rec.attendance_count = counts.get(rec.id, 0) if isinstance(rec.id, int) else len(rec.attendee_ids)
+
+    def _get_attendee_counts(self):
+        """Return {meeting_id: number of attendees}, in one grouped query."""
+        if not self:
+            return {}
+        field = self._fields['attendee_ids']
+        self.env.cr.execute(SQL(
+            "SELECT %(meeting_col)s, COUNT(*) FROM %(rel)s WHERE %(meeting_col)s IN %(ids)s GROUP BY %(meeting_col)s",
+            meeting_col=SQL.identifier(field.column1),
+            rel=SQL.identifier(field.relation),
+            ids=tuple(self.ids),
+        ))
+        return dict(self.env.cr.fetchall())
+
+    def _get_quorum_required(self, active_members=None):
+        """Return {meeting_id: attendees needed}, quorum_percent of the active members.
+
+        This is the only quorum definition: polls are quorate when their meeting is.
+        """
+        if active_members is None:
+            active_members = self.env['shifa.member'].sudo().search_count([('status', '=', 'active')])
+        return {rec.id: math.ceil(active_members * (rec.quorum_percent or 0.0) / 100.0) for rec in self}
+
+    def _get_attendance_status(self):
+        """Live attendance and quorum of the meeting, from two count queries."""
+        self.ensure_one()
+        attendance = self._get_attendee_counts().get(self.id, 0)
+        active_members = self.env['shifa.member'].sudo().search_count([('status', '=', 'active')])
+        quorum_required = self._get_quorum_required(active_members)[self.id]
+        return {
+            'attendance': attendance,
+            'active_members': active_members,
+            'quorum_required': quorum_required,
+            'quorum_reached': attendance >= quorum_required,
+        }
+
+    def _check_in_national_ids(self, national_ids):
+        """Add the members with the scanned national IDs to the attendees, in bulk.
+
+        The IDs are resolved with one query on the indexed national_id and the
+        attendances are inserted in one statement into the attendee relation
+        (ON CONFLICT DO NOTHING), without writing the meeting row, so several
+        check-in desks can scan at once. Only active members are admitted.
+        Returns {'checked_in': [...], 'already': [...], 'rejected': [{'national_id', 'reason'}]}
+        with the names of the members checked in / already present.
+        """
+        self.ensure_one()
+        if self.state not in ('draft', 'confirmed'):
+            raise ValidationError(_('Check-in is closed for this meeting.'))
+        scanned = list(dict.fromkeys(str(nid).strip() for nid in national_ids if nid and str(nid).strip()))
+        by_national_id = {}
+        for member in self.env['shifa.member'].sudo().search_fetch(
+                [('national_id', 'in', scanned)], ['national_id', 'name', 'status']):
+            # Prefer the active record if a national ID is shared
+            if member.national_id not in by_national_id or member.status == 'active':
+                by_national_id[member.national_id] = member
+
+        rejected, admitted = [], {}
+        for national_id in scanned:
+            member = by_national_id.get(national_id)
+            if not member:
+                rejected.append({'national_id': national_id, 'reason': _('Not a member')})
+            elif member.status != 'active':
+                rejected.append({'national_id': national_id, 'reason': _('Member is %s',
+                    dict(member._fields['status']._description_selection(self.env))[member.status])})
+            else:
+                admitted[member.id] = member
+
+        checked_in = set()
+        if admitted:
+            field = self._fields['attendee_ids']
+            self.env.cr.execute(SQL(
+                """INSERT INTO %(rel)s (%(meeting_col)s, %(member_col)s)
+                   SELECT %(meeting_id)s, unnest(%(member_ids)s::int[])
+                   ON CONFLICT DO NOTHING
+                   RETURNING %(member_col)s""",
+                rel=SQL.identifier(field.relation),
+                meeting_col=SQL.identifier(field.column1),
+                member_col=SQL.identifier(field.column2),
+                meeting_id=self.id,
+                member_ids=list(admitted),
+            ))
+            checked_in = {member_id for member_id, in self.env.cr.fetchall()}
+            self.invalidate_recordset(['attendee_ids', 'attendance_count'])
+        return {
+            'checked_in': [admitted[member_id].name for member_id in admitted if member_id in checked_in],
+            'already': [admitted[member_id].name for member_id in admitted if member_id not in checked_in],
+            'rejected': rejected,
+        }
+
+    def action_open_kiosk(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/shifa/meeting/{self.id}/kiosk',
+            'target': 'new',
+        }
 
     def action_confirm(self):
         self.state = 'confirmed'
@@ -48,22 +159,145 @@ class ShifaMeetingPoll(models.Model):
     _name = 'shifa.meeting.poll'
     _description = 'SHIFA Meeting Poll'
 
-    meeting_id = fields.Many2one('shifa.meeting', required=True, ondelete='cascade')
+    meeting_id = fields.Many2one('shifa.meeting', required=True, ondelete='cascade', index=True)
     question = fields.Char(required=True)
     poll_type = fields.Selection([
         ('yes_no', 'Yes/No'),
         ('options', 'Multiple Choice'),
     ], default='yes_no')
-    
-    # Simple result tracking
-    yes_count = fields.Integer(string="Yes Votes")
-    no_count = fields.Integer(string="No Votes")
-    abstain_count = fields.Integer(string="Abstain")
+    ballot_ids = fields.One2many('shifa.meeting.ballot', 'poll_id', string="Ballots")
+    ballot_count = fields.Integer(string="Votes Cast", compute='_compute_ballot_count')
+
+    # Results, frozen from the ballots when the poll is closed
+    yes_count = fields.Integer(string="Yes Votes", readonly=True)
+    no_count = fields.Integer(string="No Votes", readonly=True)
+    abstain_count = fields.Integer(string="Abstain", readonly=True)
+    attendee_count = fields.Integer(string="Attendees", readonly=True)
+    quorum_reached = fields.Boolean(readonly=True, help="The meeting attendance met the meeting quorum when the poll closed")
     
     state = fields.Selection([
         ('open', 'Open'),
         ('closed', 'Closed'),
     ], default='open')
 
+    def _compute_ballot_count(self):
+        counts = dict(self.env['shifa.meeting.ballot'].sudo()._read_group(
+            [('poll_id', 'in', self.ids)], ['poll_id'], ['__count'],
+        ))
+        for poll in self:
+            poll.ballot_count = counts.get(poll, 0)
+
+    def _get_results(self):
+        """Return {poll_id: results} from one grouped query on the ballots, one on the
+        attendees and one count of the active members (quorum of the meeting).
+
+        results: {'yes', 'no', 'abstain', 'total', 'attendees', 'quorum_reached'}
+        """
+        tallies = self.env['shifa.meeting.ballot'].sudo()._read_group(
+            [('poll_id', 'in', self.ids)], ['poll_id', 'choice'], ['__count'],
+        )
+        attendees = self.meeting_id._get_attendee_counts()
+        results = {
+            poll.id: dict(dict.fromkeys(['yes', 'no', 'abstain', 'total'], 0), attendees=attendees.get(poll.meeting_id.id, 0))
+            for poll in self
+        }
+        for poll, choice, count in tallies:
+            results[poll.id][choice] = count
+            results[poll.id]['total'] += count
+        quorum = self.meeting_id._get_quorum_required()
+        for poll in self:
+            result = results[poll.id]
+            result['quorum_reached'] = result['attendees'] >= quorum[poll.meeting_id.id]
+        return results
+
+    def _record_votes(self, votes):
+        """Record ballots for this open poll; votes is a list of (member_id, choice).
+
+        Ballots are inserted in one statement: members who are not attendees of
+        the meeting, invalid choices and members who already voted are skipped
+        (unique poll/member constraint, no row is updated). Voters only take a
+        shared lock on the poll, so votes do not contend with each other, only
+        with action_close. Returns {'recorded': [member ids], 'rejected': [member ids]};
+        malformed member ids are rejected as given.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT meeting_id FROM shifa_meeting_poll WHERE id = %s AND state = 'open' FOR SHARE", [self.id])
+        row = self.env.cr.fetchone()
+        if not row:
+            raise ValidationError(_('This poll is not open for voting.'))
+        choices = dict(BALLOT_CHOICES)
+        valid, voters, malformed = {}, set(), []
+        for value, choice in votes:
+            try:
+                member_id = int(value)
+            except (TypeError, ValueError):
+                member_id = 0
+            if isinstance(value, bool) or not 0 < member_id < 2 ** 31:
+                malformed.append(value)
+                continue
+            voters.add(member_id)
+            if choice in choices:
+                valid.setdefault(member_id, choice)
+        recorded = []
+        if valid:
+            attendees = self.env['shifa.meeting']._fields['attendee_ids']
+            self.env.cr.execute(SQL("""
+                INSERT INTO shifa_meeting_ballot (poll_id, member_id, choice, create_uid, write_uid, create_date, write_date)
+                SELECT %(poll_id)s, v.member_id, v.choice, %(uid)s, %(uid)s,
+                       now() at time zone 'UTC', now() at time zone 'UTC'
+                  FROM unnest(%(member_ids)s::int[], %(choices)s::varchar[]) AS v(member_id, choice)
+                  JOIN %(rel)s a ON a.%(member_col)s = v.member_id AND a.%(meeting_col)s = %(meeting_id)s
+                    ON CONFLICT (poll_id, member_id) DO NOTHING
+             RETURNING member_id
+            """,
+                poll_id=self.id,
+                uid=self.env.uid,
+                member_ids=list(valid),
+                choices=list(valid.values()),
+                rel=SQL.identifier(attendees.relation),
+                member_col=SQL.identifier(attendees.column2),
+                meeting_col=SQL.identifier(attendees.column1),
+                meeting_id=row[0],
+            ))
+            recorded = [member_id for member_id, in self.env.cr.fetchall()]
+            self.env['shifa.meeting.ballot'].invalidate_model()
+            self.invalidate_recordset(['ballot_ids', 'ballot_count'])
+        return {'recorded': recorded, 'rejected': sorted(voters - set(recorded)) + malformed}
+
     def action_close(self):
-        self.state = 'closed'
+        """Close the polls and freeze their tallies and quorum from the ballots.
+
+        The poll rows are locked first, so no ballot can be recorded between
+        the tally and the close.
+        """
+        polls = self.filtered(lambda p: p.state == 'open')
+        if not polls:
+            return
+        self.env.cr.execute("SELECT id FROM shifa_meeting_poll WHERE id IN %s FOR UPDATE", [tuple(polls.ids)])
+        results = polls._get_results()
+        for poll in polls:
+            result = results[poll.id]
+            poll.write({
+                'state': 'closed',
+                'yes_count': result['yes'],
+                'no_count': result['no'],
+                'abstain_count': result['abstain'],
+                'attendee_count': result['attendees'],
+                'quorum_reached': result['quorum_reached'],
+            })
+
+
+class ShifaMeetingBallot(models.Model):
+    """One member's vote on one poll; inserted, never counted on the poll row."""
+    _name = 'shifa.meeting.ballot'
+    _description = 'SHIFA Meeting Ballot'
+    _order = 'id'
+    _rec_name = 'member_id'
+
+    poll_id = fields.Many2one('shifa.meeting.poll', required=True, ondelete='cascade', readonly=True)
+    member_id = fields.Many2one('shifa.member', required=True, ondelete='cascade', readonly=True, index=True)
+    choice = fields.Selection(BALLOT_CHOICES, required=True, readonly=True)
+
+    _sql_constraints = [
+        ('poll_member_uniq', 'unique(poll_id, member_id)', 'A member can only vote once per poll.'),
+    ]
@@ -1,5 +1,81 @@
-from odoo import api, fields, models, _
-from datetime import date
+from odoo import api, fields, models, tools, _
+from odoo.tools import SQL, split_every
+from odoo.tools.lru import LRU
+from odoo.tools.pdf import merge_pdf
+from .job_run import tracked_job
+from collections import defaultdict
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+import csv
+import hashlib
+import io
+import logging
+import secrets
+import string
+import threading
+import time
+import traceback
+
+MEMBERSHIP_PDF_REPORT = 'shifa.action_report_membership_application_pdf'
+MEMBERSHIP_PDF_NAME = 'membership_application_%s.pdf'
+# Members whose PDF was asked for while stale, rendered first by cron_render_membership_pdfs
+MEMBERSHIP_PDF_QUEUE_PARAM = 'shifa.membership_pdf_requested'
+COMMITTEE_PACK_NAME = 'SHIFA_Committee_Pack_%s.pdf'
+
+_logger = logging.getLogger(__name__)
+
+# Portal summaries of this worker by (dbname, member_id, version); kept out of the
+# registry caches so portal traffic cannot evict ACL and rule entries
+_portal_summaries = LRU(1024)
+
+
+# Composite / partial indexes for the lookups the addon repeats on tables it
+# does not own (fields of SHIFA models declare their own index=...).
+# (name, table, columns, where)
+LOOKUP_INDEXES = [
+    # arrears engine, reminders, payment state refresh: unpaid invoices by due date
+    # (the predicate matches the SQL of ('payment_state', '!=', 'paid'), NULL included)
+    ('shifa_account_move_unpaid_due_idx', 'account_move',
+     ['invoice_date_due', 'partner_id'],
+     "move_type = 'out_invoice' AND state = 'posted' AND (payment_state <> 'paid' OR payment_state IS NULL)"),
+    # per-partner invoice lookups (payment state, counters, portal, eligibility)
+    ('shifa_account_move_partner_invoice_idx', 'account_move',
+     ['partner_id', 'invoice_date_due'],
+     "move_type = 'out_invoice' AND state = 'posted'"),
+    # active members by partner (mapping arrears back to members)
+    ('shifa_member_active_partner_idx', 'shifa_member',
+     ['partner_id'],
+     "status = 'active'"),
+    # partner matching by normalized email / phone (_match_partners)
+    ('shifa_res_partner_email_norm_idx', 'res_partner',
+     ['lower(trim(email))'],
+     "email IS NOT NULL"),
+    ('shifa_res_partner_phone_norm_idx', 'res_partner',
+     ["regexp_replace(phone, '[^0-9]', '', 'g')"],
+     "phone IS NOT NULL"),
+]
+
+
+def create_lookup_indexes(cr):
+    for name, table, columns, where in LOOKUP_INDEXES:
+        # plain column names are quoted, expressions are used as is
+        expressions = [column if '(' in column else f'"{column}"' for column in columns]
+        tools.create_index(cr, name, table, expressions, where=where)
+
+
+def _normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _normalize_phone(phone):
+    return ''.join(char for char in (phone or '') if char in '0123456789')
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 'on', 'x')
+    return bool(value)
+
 
 class ShifaMember(models.Model):
     _name = 'shifa.member'
@@ -8,9 +84,9 @@ class ShifaMember(models.Model):
 
     # Identity
     name = fields.Char(required=True, tracking=True)
-    partner_id = fields.Many2one('res.partner', string='Partner', ondelete='set null', tracking=True)
-    user_id = fields.Many2one('res.users', string='Website User Account', ondelete='set null', tracking=True)
-    national_id = fields.Char(string="National ID")
+    partner_id = fields.Many2one('res.partner', string='Partner', ondelete='set null', tracking=True, index='btree_not_null')
+    user_id = fields.Many2one('res.users', string='Website User Account', ondelete='set null', tracking=True, index='btree_not_null')
+    national_id = fields.Char(string="National ID", index=True)
     date_of_birth = fields.Date()
     address = fields.Text()
     phone = fields.Char()
@@ -25,7 +101,7 @@ class ShifaMember(models.Model):
         ('suspended', 'Suspended'),
         ('terminated', 'Terminated'),
         ('deceased', 'Deceased'),
-    ], default='draft', tracking=True)
+    ], default='draft', tracking=True, index=True)
     payment_state = fields.Selection([
         ('pending', 'Pending'),
         ('paid', 'Paid'),
@@ -53,7 +129,7 @@ class ShifaMember(models.Model):
         required=True,
         string="Currency"
     )
-    total_fee = fields.Monetary(compute='_compute_total_fee', string="Total Initial Fee")
+    total_fee = fields.Monetary(compute='_compute_total_fee', store=True, string="Total Initial Fee")
     entry_fee = fields.Monetary(default=500.0)
     annual_fee = fields.Monetary(default=1000.0)
     dependent_fee = fields.Monetary(default=500.0)
@@ -64,60 +140,71 @@ class ShifaMember(models.Model):
     # Donation (optional)
     donation_amount = fields.Monetary(string="Donation Amount")
 
-    # Convenience computed values
-    dependent_count = fields.Integer(compute='_compute_dependent_count', store=False)
-    invoice_count = fields.Integer(compute='_compute_invoice_count', store=False)
+    # Convenience computed values (stored so list/kanban views can sort and filter on them)
+    dependent_count = fields.Integer(compute='_compute_dependent_count', store=True)
+    invoice_count = fields.Integer(compute='_compute_invoice_count', store=True)
+
+    def init(self):
+        super().init()
+        create_lookup_indexes(self.env.cr)
 
     @api.depends('dependent_ids')
     def _compute_dependent_count(self):
         for rec in self:
             rec.dependent_count = len(rec.dependent_ids)
 
+    @api.depends('partner_id', 'partner_id.invoice_ids', 'partner_id.invoice_ids.move_type')
     def _compute_invoice_count(self):
+        # One grouped count for the whole recordset
+        counts = {}
+        if self.partner_id:
+            counts = {
+                partner.id: count
+                for partner, count in self.env['account.move']._read_group(
+                    [('partner_id', 'in', self.partner_id.ids), ('move_type', '=', 'out_invoice')],
+                    groupby=['partner_id'],
+                    aggregates=['__count'],
+                )
+            }
         for rec in self:
-            if rec.partner_id:
-                rec.invoice_count = self.env['account.move'].search_count([
-                    ('partner_id', '=', rec.partner_id.id),
-                    ('move_type', '=', 'out_invoice')
-                ])
-            else:
-                rec.invoice_count = 0
+            rec.invoice_count = counts.get(rec.partner_id.id, 0) if rec.partner_id else 0
 
-    @api.depends('partner_id', 'partner_id.invoice_ids.payment_state')
+    @api.depends('partner_id', 'partner_id.invoice_ids.payment_state', 'partner_id.invoice_ids.state')
     def _compute_payment_state(self):
         """Compute payment state based on member's invoices"""
-        for rec in self:
-            if not rec.partner_id:
-                rec.payment_state = 'pending'
-                continue
-            
-            # Get all invoices for this member
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', rec.partner_id.id),
+        today = fields.Date.today()
+        # Prefetch the posted invoices of every partner in one query
+        invoices_by_partner = defaultdict(list)
+        partner_ids = self.partner_id.ids
+        if partner_ids:
+            invoices = self.env['account.move'].search_fetch([
+                ('partner_id', 'in', partner_ids),
                 ('move_type', '=', 'out_invoice'),
-                ('state', '=', 'posted')
-            ])
-            
+                ('state', '=', 'posted'),
+            ], ['partner_id', 'payment_state', 'invoice_date_due', 'invoice_date'])
+            for inv in invoices:
+                invoices_by_partner[inv.partner_id.id].append(inv)
+
+        for rec in self:
+            invoices = invoices_by_partner.get(rec.partner_id.id) if rec.partner_id else None
             if not invoices:
                 rec.payment_state = 'pending'
-            else:
-                # If all posted invoices are paid -> paid
-                if all(inv.payment_state == 'paid' for inv in invoices):
-                    rec.payment_state = 'paid'
-                    continue
+                continue
 
-                # If there exists an invoice past due -> arrears
-                past_due = False
-                for inv in invoices:
-                    # Use invoice_date_due when set, otherwise invoice_date
-                    due = inv.invoice_date_due or inv.invoice_date
-                    if due and due < fields.Date.today() and inv.payment_state != 'paid':
-                        past_due = True
-                        break
-                if past_due:
-                    rec.payment_state = 'arrears'
-                else:
-                    rec.payment_state = 'pending'
+            # If all posted invoices are paid -> paid
+            if all(inv.payment_state == 'paid' for inv in invoices):
+                rec.payment_state = 'paid'
+                continue
+
+            # If there exists an invoice past due -> arrears
+            past_due = False
+            for inv in invoices:
+                # Use invoice_date_due when set, otherwise invoice_date
+                due = inv.invoice_date_due or inv.invoice_date
+                if due and due < today and inv.payment_state != 'paid':
+                    past_due = True
+                    break
+            rec.payment_state = 'arrears' if past_due else 'pending'
 
     @api.depends('dependent_ids', 'entry_fee', 'annual_fee', 'dependent_fee')
     def _compute_total_fee(self):
@@ -125,92 +212,215 @@ class ShifaMember(models.Model):
             rec.total_fee = (rec.entry_fee or 0.0) + (rec.annual_fee or 0.0) + (len(rec.dependent_ids) * (rec.dependent_fee or 0.0))
 
     # --------- Helpers ---------
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_receivable_account_id(self, company_id):
+        """Receivable account of new member partners, looked up once per company."""
+        # Get default receivable account
+        receivable_account = self.env.ref('shifa.account_shifa_receivable', raise_if_not_found=False)
+        # Check if account exists and is available for the current company
+        if not receivable_account:
+            receivable_account = self.env['account.account'].sudo().search([
+                ('account_type', '=', 'asset_receivable'),
+                ('company_ids', 'in', [company_id])
+            ], limit=1)
+        return receivable_account.id or False
+
+    def _match_partners(self):
+        """Return {member_id: partner_id} of existing partners matching these members.
+
+        A member matches the partner of another member with the same national
+        ID, else an active partner of another member with the same normalized
+        email or phone and the same name (families often share an email or
+        phone, so a contact alone is not enough; vendors, employees and other
+        contacts are never reused). Each source is resolved with one query.
+        """
+        matches = {}
+        national_ids = {rec.national_id for rec in self if rec.national_id}
+        if national_ids:
+            by_national_id = {}
+            for other in self.with_context(active_test=False).search_fetch([
+                ('national_id', 'in', list(national_ids)),
+                ('partner_id', '!=', False),
+                ('id', 'not in', self.ids),
+            ], ['national_id', 'partner_id'], order='id'):
+                by_national_id.setdefault(other.national_id, other.partner_id.id)
+            for rec in self:
+                if rec.national_id in by_national_id:
+                    matches[rec.id] = by_national_id[rec.national_id]
+
+        rest = self.filtered(lambda r: r.id not in matches and (r.email or r.phone))
+        emails = list({_normalize_email(rec.email) for rec in rest if _normalize_email(rec.email)})
+        phones = list({_normalize_phone(rec.phone) for rec in rest if _normalize_phone(rec.phone)})
+        if emails or phones:
+            # Same expressions as the shifa_res_partner_*_norm_idx indexes
+            self.env.cr.execute(SQL("""
+                SELECT p.id, lower(trim(p.name)), lower(trim(p.email)), regexp_replace(p.phone, '[^0-9]', '', 'g')
+                  FROM res_partner p
+                 WHERE p.active
+                   AND (p.company_id IS NULL OR p.company_id = %(company_id)s)
+                   AND (lower(trim(p.email)) = ANY(%(emails)s)
+                        OR regexp_replace(p.phone, '[^0-9]', '', 'g') = ANY(%(phones)s))
+                   AND EXISTS (SELECT 1 FROM shifa_member m WHERE m.partner_id = p.id)
+              ORDER BY p.id
+            """, company_id=self.env.company.id, emails=emails, phones=phones))
+            by_email, by_phone = {}, {}
+            for partner_id, name, email, phone in self.env.cr.fetchall():
+                if email:
+                    by_email.setdefault((name, email), partner_id)
+                if phone:
+                    by_phone.setdefault((name, phone), partner_id)
+            for rec in rest:
+                name = (rec.name or '').strip().lower()
+                partner_id = by_email.get((name, _normalize_email(rec.email))) or \
+                    by_phone.get((name, _normalize_phone(rec.phone)))
+                if partner_id:
+                    matches[rec.id] = partner_id
+        return matches
+
     def _get_or_create_partner(self):
-        for rec in self:
-            if rec.partner_id:
-                continue
-            # Get default receivable account
-            # Get default receivable account
-            receivable_account = self.env.ref('shifa.account_shifa_receivable', raise_if_not_found=False)
-            # Check if account exists and is available for the current company
-            if not receivable_account:
-                receivable_account = self.env['account.account'].search([
-                    ('account_type', '=', 'asset_receivable'),
-                    ('company_ids', 'in', [rec.env.company.id])
-                ], limit=1)
+        """Link these members to a partner: reuse a matching one, else create it.
 
-            partner_vals = {
-                'name': rec.name,
-                'email': rec.email or False,
-                'phone': rec.phone or False,
-                'street': rec.address or False,
-                'property_account_receivable_id': receivable_account.id if receivable_account else False,
-            }
-            rec.partner_id = self.env['res.partner'].create(partner_vals)
-
-    def _create_website_user(self):
-        """Create a website user account using National ID as username"""
-        import secrets
-        import string
-        
-        generated_passwords = {}
-        
-        for rec in self:
-            if rec.user_id or not rec.national_id:
-                continue
-                
-            # Ensure partner exists first
-            rec._get_or_create_partner()
-            
-            # Check if user with this login already exists
-            existing_user = self.env['res.users'].search([('login', '=', rec.national_id)], limit=1)
-            if existing_user:
-                rec.user_id = existing_user
+        Matching partners are resolved in batch (_match_partners); the misses
+        are multi-created, one partner per person when the same national ID
+        or contact appears twice in the batch.
+        """
+        members = self.filtered(lambda r: not r.partner_id)
+        if not members:
+            return
+        matches = members._match_partners()
+        receivable_account_id = self._get_receivable_account_id(self.env.company.id)
+
+        to_create = {}  # person key -> (partner vals, members)
+        for rec in members:
+            if rec.id in matches:
                 continue
-            
-            # Generate a random password
-            password_length = 8
-            password_chars = string.ascii_letters + string.digits
-            generated_password = ''.join(secrets.choice(password_chars) for _ in range(password_length))
-            
-            # Get the website member group
-            website_member_group = self.env.ref('shifa.group_website_member', raise_if_not_found=False)
-            if not website_member_group:
-                # Create the group if it doesn't exist
-                website_member_group = self.env['res.groups'].sudo().create({
-                    'name': 'SHIFA Website Members',
-                    'comment': 'Members who can access their profile on website but not admin panel',
-                    'category_id': self.env.ref('base.module_category_hidden').id,
-                })
-            
-            # Get portal user group for basic access
-            portal_group = self.env.ref('base.group_portal', raise_if_not_found=False)
-            groups_to_assign = [website_member_group.id]
-            if portal_group:
-                groups_to_assign.append(portal_group.id)
-            
-            # Create user account
-            user_vals = {
+            name = (rec.name or '').strip().lower()
+            key = (('national_id', rec.national_id) if rec.national_id
+                   else ('email', name, _normalize_email(rec.email)) if _normalize_email(rec.email)
+                   else ('phone', name, _normalize_phone(rec.phone)) if _normalize_phone(rec.phone)
+                   else ('member', rec.id))
+            if key not in to_create:
+                to_create[key] = ({
+                    'name': rec.name,
+                    'email': rec.email or False,
+                    'phone': rec.phone or False,
+                    'street': rec.address or False,
+                    'property_account_receivable_id': receivable_account_id,
+                }, [])
+            to_create[key][1].append(rec)
+
+        if to_create:
+            partners = self.env['res.partner'].create([vals for vals, _recs in to_create.values()])
+            for partner, (_vals, recs) in zip(partners, to_create.values()):
+                for rec in recs:
+                    matches[rec.id] = partner.id
+        for rec in members:
+            rec.partner_id = matches[rec.id]
+        _logger.debug("SHIFA: linked %s member(s) to partners, %s created", len(members), len(to_create))
+
+    def _create_website_user(self, chunk_size=100):
+        """Create website user accounts using National ID as username, in batch.
+
+        Existing logins are resolved with one query, the groups once, and users
+        are created in chunks (a failing chunk is retried user by user). Members
+        with an email address get no password: a signup invitation to set one
+        is queued by mail (email_website_invitation). Only members without an
+        email address get a generated password, returned as {member_id: password}
+        for display and never stored in a mail.
+        """
+        members = self.filtered(lambda r: not r.user_id and r.national_id)
+        if not members:
+            return {}
+
+        # Ensure partners exist first
+        members._get_or_create_partner()
+
+        # Link members whose login already exists
+        Users = self.env['res.users'].sudo().with_context(active_test=False)
+        existing = {
+            user.login: user
+            for user in Users.search_fetch([('login', 'in', list(set(members.mapped('national_id'))))], ['login'])
+        }
+        to_create = self.browse()
+        pending_logins = set()
+        for rec in members:
+            if rec.national_id in existing:
+                rec.user_id = existing[rec.national_id]
+            elif rec.national_id in pending_logins:
+                _logger.warning("Member %s shares National ID %s with another member; no user created", rec.name, rec.national_id)
+            else:
+                pending_logins.add(rec.national_id)
+                to_create |= rec
+        if not to_create:
+            return {}
+
+        groups_to_assign = self._get_website_user_group_ids()
+        password_chars = string.ascii_letters + string.digits
+        passwords = {
+            rec.id: ''.join(secrets.choice(password_chars) for _ in range(8))
+            for rec in to_create if not rec.email
+        }
+
+        def user_vals(rec):
+            return {
                 'name': rec.name,
                 'login': rec.national_id,  # Use National ID as username
-                'password': generated_password,
+                'password': passwords.get(rec.id, False),
                 'email': rec.email or False,
                 'partner_id': rec.partner_id.id,
                 'groups_id': [(6, 0, groups_to_assign)],  # Portal + website member groups
                 'active': True,
             }
-            
+
+        Users = Users.with_context(no_reset_password=True)
+        created = self.browse()
+        for chunk in split_every(chunk_size, to_create.ids, self.browse):
             try:
-                user = self.env['res.users'].sudo().create(user_vals)
-                rec.user_id = user
-                generated_passwords[rec.id] = generated_password
-            except Exception as e:
-                # Log the error but don't fail the member creation
-                import logging
-                _logger = logging.getLogger(__name__)
-                _logger.warning(f"Failed to create user account for member {rec.name}: {str(e)}")
-        
-        return generated_passwords
+                with self.env.cr.savepoint():
+                    users = Users.create([user_vals(rec) for rec in chunk])
+                for rec, user in zip(chunk, users):
+                    rec.user_id = user
+                created |= chunk
+            except Exception:
+                for rec in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            rec.user_id = Users.create(user_vals(rec))
+                        created |= rec
+                    except Exception as e:
+                        # Log the error but don't fail the member creation
+                        _logger.warning("Failed to create user account for member %s (National ID %s): %s",
+                                        rec.name, rec.national_id, e)
+
+        # Same invitation as auth_signup's, but queued: action_reset_password()
+        # would send one mail per user from the request
+        invited = created.filtered('email')
+        tmpl = self.env.ref('shifa.email_website_invitation', raise_if_not_found=False)
+        if invited and tmpl:
+            invited.user_id.partner_id.sudo().signup_prepare(signup_type='signup')
+            mails = tmpl.sudo().send_mail_batch(invited.ids, force_send=False)
+            self.env['shifa.job.run']._add_counts(mails=len(mails))
+        return {rec.id: passwords[rec.id] for rec in created if rec.id in passwords}
+
+    @api.model
+    def _get_website_user_group_ids(self):
+        # Get the website member group
+        website_member_group = self.env.ref('shifa.group_website_member', raise_if_not_found=False)
+        if not website_member_group:
+            # Create the group if it doesn't exist
+            website_member_group = self.env['res.groups'].sudo().create({
+                'name': 'SHIFA Website Members',
+                'comment': 'Members who can access their profile on website but not admin panel',
+                'category_id': self.env.ref('base.module_category_hidden').id,
+            })
+
+        # Get portal user group for basic access
+        portal_group = self.env.ref('base.group_portal', raise_if_not_found=False)
+        groups_to_assign = [website_member_group.id]
+        if portal_group:
+            groups_to_assign.append(portal_group.id)
+        return groups_to_assign
 
     # --------- Actions ---------
     def action_view_invoices(self):
@@ -227,77 +437,92 @@ class ShifaMember(models.Model):
 
     def action_refresh_payment_state(self):
         """Manual action to refresh payment state"""
-        self._compute_payment_state()
+        self._refresh_payment_state()
 
+    def _refresh_payment_state(self):
+        """Recompute and store payment_state for these members."""
+        self.env.add_to_compute(self._fields['payment_state'], self)
+        self.flush_recordset(['payment_state'])
+
+    @tracked_job('Approve Members')
     def action_approve(self):
+        self._get_or_create_partner()
         for rec in self:
-            rec._get_or_create_partner()
             rec.status = 'active'
             rec.membership_start_date = fields.Date.today()
             rec._create_initial_invoice()
+        # Members created in the back office get their website account on approval
+        self._create_website_user()
 
     def _notify_committee_arrears(self, members):
         """Send notification to Treasurer and Secretary about members in arrears.
-        Expects a recordset of shifa.member."""
+        Expects a recordset of shifa.member.
+
+        By default one digest listing every member is queued per run
+        (email_arrears_digest); with the 'One Email per Member' setting one
+        email_arrears_notification per member is queued instead. Recipients
+        are resolved once per run, from a cache kept until group membership
+        changes. The members are logged as an 'arrears' reminder batch."""
         if not members:
             return
+        Config = self.env['shifa.config'].sudo()
+        email_to = Config._get_committee_emails()
+        if not email_to:
+            _logger.warning("SHIFA: no committee recipients configured, arrears notification for %s member(s) not sent",
+                            len(members))
+            self.env['shifa.job.run']._add_counts(message='Arrears notification skipped: no committee recipients')
+            return
         try:
-            tmpl = self.env.ref('shifa.email_arrears_notification', raise_if_not_found=False)
-            if not tmpl:
-                return
-            # send using the members model (template expects a member)
-            # send using the members model (template expects a member)
-            # Fetch committee emails from config
-            config = self.env['shifa.config'].sudo().get_settings()
-            email_to = False
-            if config:
-                email_to = config.committee_notification_emails
-            
-            for m in members:
-                if email_to:
-                    # If we have specific emails, we might need to override the template's 'email_to'
-                    # or ensure the template uses a context variable.
-                    # For simplicity, let's assume the template sends to the member, 
-                    # but we want to notify the committee ABOUT the member.
-                    # Actually, the requirement is "Notify Treasurer and Secretary OF arrears".
-                    # So we should send TO the committee, not the member (for this specific notification).
-                    # We'll pass email_to in context or values.
-                    tmpl.sudo().with_context(email_to=email_to).send_mail(m.id, force_send=False, email_values={'email_to': email_to})
-                else:
-                    # Fallback to template default
-                    tmpl.sudo().send_mail(m.id, force_send=False)
-        except Exception:
-            # avoid cron failure if email template missing or error
-            _logger = self.env['ir.logging']
-            _logger.sudo().create({
+            with self.env.cr.savepoint():
+                config = Config.get_settings()
+                per_member = bool(config) and config.arrears_notification_mode == 'member'
+                amounts = self._get_amount_due_by_partner(partner_ids=members.partner_id.ids)
+                self.env['shifa.reminder']._enqueue_reminders(
+                    members,
+                    'arrears',
+                    self.env.ref('shifa.email_arrears_notification', raise_if_not_found=False) if per_member else None,
+                    digest_template=None if per_member else self.env.ref('shifa.email_arrears_digest', raise_if_not_found=False),
+                    amounts={m.id: amounts.get(m.partner_id.id, 0.0) for m in members},
+                    email_values={'email_to': email_to},
+                    throttle=False,
+                )
+        except Exception as e:
+            # avoid cron failure if email template missing or error, but keep the details
+            _logger.exception("SHIFA: failed to send arrears notification for %s member(s)", len(members))
+            self.env['ir.logging'].sudo().create({
                 'name': 'shifa.arrears.notify',
                 'type': 'server',
                 'dbname': self.env.cr.dbname,
                 'level': 'ERROR',
-                'message': 'Failed to send arrears notification',
+                'message': 'Failed to send arrears notification for members %s: %s\n%s' % (
+                    members.ids, e, traceback.format_exc()),
                 'path': 'shifa.models.member',
                 'line': '0',
                 'func': '_notify_committee_arrears',
             })
+            self.env['shifa.job.run']._add_counts(message=f'Arrears notification failed: {e}')
 
+    @tracked_job('Suspend Members')
     def action_suspend(self):
         self.write({'status': 'suspended'})
 
+    @tracked_job('Terminate Members')
     def action_terminate(self):
-        for rec in self:
-            rec.status = 'terminated'
-            rec._promote_first_dependent_if_applicable()
+        self.write({'status': 'terminated'})
+        self._promote_first_dependent_if_applicable()
+        self.env['shifa.job.run']._add_counts(scanned=len(self), changed=len(self))
 
+    @tracked_job('Mark Members Deceased')
     def action_mark_deceased(self):
-        for rec in self:
-            rec.status = 'deceased'
-            rec._promote_first_dependent_if_applicable()
+        self.write({'status': 'deceased'})
+        self._promote_first_dependent_if_applicable()
+        self.env['shifa.job.run']._add_counts(scanned=len(self), changed=len(self))
 
     # --------- Invoicing ---------
     def _create_initial_invoice(self):
         """Entrance + annual + dependent fee lines (and optional donation)."""
+        self._get_or_create_partner()
         for rec in self:
-            rec._get_or_create_partner()
             # Get default income account
             account = self.env.ref('shifa.account_shifa_income', raise_if_not_found=False)
             if not account:
@@ -341,169 +566,567 @@ class ShifaMember(models.Model):
             })
             inv.action_post()
 
-    def create_annual_invoice(self):
-        """Annual renewal (to be called yearly, e.g. via cron).
-           Adds dependent fees; keeps dependents even if unsubscribed but sets fee to 0 for unsubscribed."""
-        for rec in self.filtered(lambda r: r.status == 'active'):
-            rec._get_or_create_partner()
-            
-            # Get default income account
-            account = self.env.ref('shifa.account_shifa_income', raise_if_not_found=False)
-            if not account:
-                account = self.env['account.account'].search([
-                    ('account_type', '=', 'income'),
-                    ('company_ids', 'in', [rec.env.company.id])
-                ], limit=1)
-            
-            line_vals = [(0, 0, {'name': 'Annual Subscription', 'quantity': 1, 'price_unit': rec.annual_fee, 'account_id': account.id if account else False})]
+    @api.model
+    def _get_income_account(self):
+        account = self.env.ref('shifa.account_shifa_income', raise_if_not_found=False)
+        if not account:
+            account = self.env['account.account'].search([
+                ('account_type', '=', 'income'),
+                ('company_ids', 'in', [self.env.company.id])
+            ], limit=1)
+        return account
+
+    def _prepare_annual_invoice_vals(self, account, due_date):
+        """Build the account.move values of the annual renewal invoice of each member."""
+        invoice_date = fields.Date.today()
+        account_id = account.id if account else False
+        vals_list = []
+        for rec in self:
+            line_vals = [(0, 0, {'name': 'Annual Subscription', 'quantity': 1, 'price_unit': rec.annual_fee, 'account_id': account_id})]
             for d in rec.dependent_ids:
                 price = 0.0 if d.subscription_state == 'unsubscribed' else (0.0 if d.is_orphan else rec.dependent_fee)
-                line_vals.append((0, 0, {'name': f'Dependent Fee: {d.name}', 'quantity': 1, 'price_unit': price, 'account_id': account.id if account else False}))
-            today = fields.Date.today()
-            due_date = fields.Date.to_string(fields.Date.from_string(f"{today.year}-03-31"))
-            inv = self.env['account.move'].create({
+                line_vals.append((0, 0, {'name': f'Dependent Fee: {d.name}', 'quantity': 1, 'price_unit': price, 'account_id': account_id}))
+            vals_list.append({
                 'move_type': 'out_invoice',
                 'partner_id': rec.partner_id.id,
-                'invoice_date': fields.Date.today(),
+                'invoice_date': invoice_date,
                 'invoice_date_due': due_date,
                 'invoice_line_ids': line_vals,
             })
-            inv.action_post()
+        return vals_list
+
+    @tracked_job('Annual Invoicing')
+    def create_annual_invoice(self):
+        """Annual renewal (to be called yearly, e.g. via cron).
+           Adds dependent fees; keeps dependents even if unsubscribed but sets fee to 0 for unsubscribed.
+           Invoices of the whole recordset are created with one multi-create and posted together."""
+        members = self.filtered(lambda r: r.status == 'active')
+        if not members:
+            return self.env['account.move']
+        members._get_or_create_partner()
+        today = fields.Date.today()
+        due_date = fields.Date.to_string(fields.Date.from_string(f"{today.year}-03-31"))
+        invoices = self.env['account.move'].create(
+            members._prepare_annual_invoice_vals(self._get_income_account(), due_date)
+        )
+        invoices.action_post()
+        self.env['shifa.job.run']._add_counts(scanned=len(self), changed=len(invoices))
+        return invoices
 
     # --------- Promotions / Notifications ---------
     def _promote_first_dependent_if_applicable(self):
         """If a member is off (terminated/deceased), promote first dependent to member & notify.
-           If dependent declines, keep as dependent but mark unsubscribed."""
-        MailTemplate = self.env['mail.template']
-        tmpl = self.env.ref('shifa.email_dependent_promoted', raise_if_not_found=False)
-        for rec in self:
-            first_dep = False
+           If dependent declines, keep as dependent but mark unsubscribed.
+
+           Works on the whole recordset: the promotions are planned first, the
+           promoted members and their partners are multi-created, and the
+           notifications are queued for the mail queue instead of being sent
+           inside the transaction. Members already handled (notification_sent)
+           are skipped, so off-boarding twice does not promote twice."""
+        to_promote = []
+        declined = self.env['shifa.dependent']
+        declined_members = self.browse()
+        for rec in self.filtered(lambda r: not r.notification_sent):
             # Prefer spouse; else first dependent
             spouse = rec.dependent_ids.filtered(lambda d: d.relation == 'spouse' and d.subscription_state != 'unsubscribed')[:1]
-            if spouse:
-                first_dep = spouse
-            elif rec.dependent_ids:
-                first_dep = rec.dependent_ids[:1]
-            if not first_dep:
+            dep = spouse or rec.dependent_ids[:1]
+            if not dep:
                 continue
-
-            dep = first_dep[0]
             if dep.auto_promote:
-                # Create a full member from dependent
-                new_member = self.create({
-                    'name': dep.name,
-                    'email': rec.email,   # reuse main contact if desired
-                    'phone': rec.phone,
-                    'address': rec.address,
-                    'status': 'active',
-                    'category': 'member',
-                    'is_auto_promoted': True,
-                    'linked_member_id': rec.id,
-                })
-                new_member._get_or_create_partner()
-                if tmpl:
-                    tmpl.sudo().send_mail(new_member.id, force_send=True)
-                rec.notification_sent = True
+                to_promote.append((rec, dep))
             else:
                 # Dependent does not want to become member → keep but unsubscribe
-                dep.subscription_state = 'unsubscribed'
-                if tmpl:
-                    # Notify committee that dependent declined promotion
-                    tmpl_decline = self.env.ref('shifa.email_dependent_declined', raise_if_not_found=False)
-                    if tmpl_decline:
-                        tmpl_decline.sudo().send_mail(rec.id, force_send=True)
+                declined |= dep
+                declined_members |= rec
 
-    # --------- CRON Jobs ---------
+        if to_promote:
+            # Create full members from the dependents
+            new_members = self.create([{
+                'name': dep.name,
+                'email': rec.email,   # reuse main contact if desired
+                'phone': rec.phone,
+                'address': rec.address,
+                'status': 'active',
+                'category': 'member',
+                'is_auto_promoted': True,
+                'linked_member_id': rec.id,
+            } for rec, dep in to_promote])
+            new_members._get_or_create_partner()
+            self.browse([rec.id for rec, _dep in to_promote]).write({'notification_sent': True})
+            tmpl = self.env.ref('shifa.email_dependent_promoted', raise_if_not_found=False)
+            mails = tmpl.sudo().send_mail_batch(new_members.ids, force_send=False) if tmpl else []
+            self.env['shifa.job.run']._add_counts(changed=len(new_members), mails=len(mails))
+
+        if declined:
+            declined.write({'subscription_state': 'unsubscribed'})
+            # Notify committee that dependents declined promotion
+            tmpl_decline = self.env.ref('shifa.email_dependent_declined', raise_if_not_found=False)
+            if tmpl_decline:
+                mails = tmpl_decline.sudo().send_mail_batch(declined_members.ids, force_send=False)
+                self.env['shifa.job.run']._add_counts(mails=len(mails))
+
+    # --------- Portal summary ---------
+    def _get_portal_summary_version(self):
+        """Version of the portal summary: changes whenever the member, its dependents or its invoices change."""
+        self.ensure_one()
+        dependents = self.env['shifa.dependent'].sudo()._read_group(
+            [('member_id', '=', self.id)], aggregates=['__count', 'write_date:max'],
+        )[0]
+        invoices = self.env['account.move'].sudo()._read_group(
+            [('partner_id', '=', self.partner_id.id), ('move_type', '=', 'out_invoice')],
+            aggregates=['__count', 'write_date:max'],
+        )[0] if self.partner_id else ()
+        key = f'{self.id}|{self.write_date}|{dependents}|{invoices}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _get_portal_summary(self):
+        """Return (version, summary) for the member portal; the summary is cached per version.
+
+        The summary is a plain, JSON-serializable dict shared between requests:
+        callers must not modify it.
+        """
+        self.ensure_one()
+        version = self._get_portal_summary_version()
+        key = (self.env.cr.dbname, self.id, version)
+        summary = _portal_summaries.get(key)
+        if summary is None:
+            summary = _portal_summaries[key] = self._prepare_portal_summary()
+        return version, summary
+
+    def _prepare_portal_summary(self):
+        self.ensure_one()
+        member = self.sudo()
+        invoices = self.env['account.move'].sudo().search([
+            ('partner_id', '=', member.partner_id.id),
+            ('move_type', '=', 'out_invoice'),
+            ('state', '=', 'posted')
+        ], order='invoice_date desc', limit=10) if member.partner_id else self.env['account.move']
+        amount_due = self._get_amount_due_by_partner(partner_ids=member.partner_id.ids).get(member.partner_id.id, 0.0)
+        return {
+            'id': member.id,
+            'name': member.name,
+            'national_id': member.national_id or '',
+            'date_of_birth': fields.Date.to_string(member.date_of_birth) or '',
+            'phone': member.phone or '',
+            'email': member.email or '',
+            'address': member.address or '',
+            'admission_date': fields.Date.to_string(member.admission_date) or '',
+            'status': member.status,
+            'payment_state': member.payment_state or 'pending',
+            'total_fee': member.total_fee,
+            'amount_due': amount_due,
+            'dependents': [{
+                'name': dep.name,
+                'relation': dep.relation,
+                'date_of_birth': fields.Date.to_string(dep.date_of_birth) or '',
+                'age_group': dict(dep._fields['age_group'].selection).get(dep.age_group, 'Unknown'),
+                'subscription_state': dep.subscription_state,
+            } for dep in member.dependent_ids],
+            'invoices': [{
+                'name': inv.name,
+                'invoice_date': fields.Date.to_string(inv.invoice_date) or '',
+                'invoice_date_due': fields.Date.to_string(inv.invoice_date_due) or '',
+                'amount_total': inv.amount_total,
+                'amount_residual': inv.amount_residual,
+                'payment_state': inv.payment_state,
+            } for inv in invoices],
+        }
+
+    # --------- Bulk import ---------
     @api.model
-    def cron_suspend_arrears(self):
-        """Suspend members with payment_state = arrears."""
-        # Find members with invoices overdue by more than 90 days
-        today = fields.Date.today()
-        members_to_suspend = self.browse()
-        for m in self.search([('status', '=', 'active')]):
-            if not m.partner_id:
+    def _prepare_import_row(self, row):
+        """Validate one import row; return (member vals, [dependent vals]) or raise ValueError."""
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise ValueError(_('Missing member name.'))
+        vals = {'name': name, 'status': row.get('status') or 'draft'}
+        for field in ('national_id', 'address', 'phone', 'email'):
+            if row.get(field):
+                vals[field] = str(row[field]).strip()
+        for field in ('date_of_birth', 'admission_date'):
+            if row.get(field):
+                vals[field] = fields.Date.to_date(row[field])
+        if row.get('category'):
+            vals['category'] = row['category']
+        if row.get('donation_amount'):
+            vals['donation_amount'] = float(row['donation_amount'])
+        for field in ('status', 'category'):
+            if field in vals and vals[field] not in dict(self._fields[field].selection):
+                raise ValueError(_('Invalid %(field)s "%(value)s".', field=field, value=vals[field]))
+
+        relations = dict(self.env['shifa.dependent']._fields['relation'].selection)
+        dependents = []
+        for dep in row.get('dependents') or []:
+            dep_name = (dep.get('name') or '').strip()
+            if not dep_name:
+                raise ValueError(_('Missing dependent name.'))
+            relation = dep.get('relation') or 'child'
+            if relation not in relations:
+                raise ValueError(_('Invalid dependent relation "%s".', relation))
+            dependents.append({
+                'name': dep_name,
+                'relation': relation,
+                'date_of_birth': fields.Date.to_date(dep['date_of_birth']) if dep.get('date_of_birth') else False,
+                'id_number': dep.get('id_number') or False,
+                'is_care_dependent': _to_bool(dep.get('is_care_dependent')),
+                'is_orphan': _to_bool(dep.get('is_orphan')),
+                'auto_promote': _to_bool(dep.get('auto_promote')),
+            })
+        return vals, dependents
+
+    @api.model
+    def _import_member_chunk(self, items):
+        """Multi-create the members of `items` [(row, vals, dependents)] and their dependents."""
+        members = self.create([vals for _row, vals, _deps in items])
+        dep_vals = [
+            dict(dep, member_id=member.id)
+            for member, (_row, _vals, deps) in zip(members, items)
+            for dep in deps
+        ]
+        if dep_vals:
+            self.env['shifa.dependent'].create(dep_vals)
+        return members
+
+    @api.model
+    @tracked_job('Member Import')
+    def import_members(self, rows, chunk_size=200, create_users=False):
+        """Create members with nested dependents in bulk.
+
+        rows: list of dicts with member fields and an optional 'dependents' list.
+        Duplicates (national_id already known or repeated in the batch) are looked
+        up with one query. Members are multi-created per chunk; a failing chunk is
+        retried row by row so one bad row does not abort the batch.
+        With create_users, website accounts of the imported members are provisioned
+        in batch as well.
+        Returns one report line per row: {'row', 'status', 'member_id', 'message'}
+        where status is 'created', 'duplicate' or 'error'.
+        """
+        report = {}
+        national_ids = {str(row.get('national_id')).strip() for row in rows if row.get('national_id')}
+        known = set(self.with_context(active_test=False).search_fetch(
+            [('national_id', 'in', list(national_ids))], ['national_id'],
+        ).mapped('national_id')) if national_ids else set()
+
+        items = []
+        for row_no, row in enumerate(rows, 1):
+            try:
+                vals, dependents = self._prepare_import_row(row)
+            except (ValueError, TypeError) as e:
+                report[row_no] = {'row': row_no, 'status': 'error', 'member_id': False, 'message': str(e)}
                 continue
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', m.partner_id.id),
-                ('move_type', '=', 'out_invoice'),
-                ('state', '=', 'posted'),
-                ('payment_state', '!=', 'paid'),
-            ])
-            overdue = False
-            for inv in invoices:
-                due = inv.invoice_date_due or inv.invoice_date
-                if due and (today - due).days > 90:
-                    overdue = True
-                    break
-            if overdue:
-                members_to_suspend |= m
+            national_id = vals.get('national_id')
+            if national_id and national_id in known:
+                report[row_no] = {'row': row_no, 'status': 'duplicate', 'member_id': False,
+                                  'message': _('National ID %s already exists.', national_id)}
+                continue
+            if national_id:
+                known.add(national_id)
+            items.append((row_no, vals, dependents))
 
+        for chunk in split_every(chunk_size, items, list):
+            try:
+                with self.env.cr.savepoint():
+                    members = self._import_member_chunk(chunk)
+            except Exception:
+                # Retry the chunk row by row to isolate the bad rows
+                members = self.browse()
+                for item in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            members |= self._import_member_chunk([item])
+                    except Exception as e:
+                        report[item[0]] = {'row': item[0], 'status': 'error', 'member_id': False, 'message': str(e)}
+            created_items = [item for item in chunk if item[0] not in report]
+            for member, (row_no, _vals, _deps) in zip(members, created_items):
+                report[row_no] = {'row': row_no, 'status': 'created', 'member_id': member.id, 'message': ''}
+
+        if create_users:
+            created_ids = [line['member_id'] for line in report.values() if line['status'] == 'created']
+            self.browse(created_ids)._create_website_user()
+
+        created_count = sum(1 for line in report.values() if line['status'] == 'created')
+        self.env['shifa.job.run']._add_counts(scanned=len(rows), changed=created_count)
+        _logger.info("SHIFA: imported %s of %s member row(s)", created_count, len(rows))
+        return [report[row_no] for row_no in sorted(report)]
+
+    @api.model
+    def import_members_csv(self, csv_data, chunk_size=200, create_users=False):
+        """Same as import_members, from CSV text.
+
+        Member columns: name, national_id, date_of_birth, address, phone, email,
+        category, status, donation_amount, admission_date. Dependent columns are
+        prefixed with "dependent_" (dependent_name, dependent_relation, ...).
+        Consecutive lines with the same national_id add dependents to the same
+        member. Report rows refer to the first CSV line of each member.
+        """
+        rows = []
+        line_numbers = []
+        reader = csv.DictReader(io.StringIO(csv_data))
+        for line_no, line in enumerate(reader, 2):
+            line = {key.strip(): (value or '').strip() for key, value in line.items() if key}
+            dependent = {key[len('dependent_'):]: value for key, value in line.items() if key.startswith('dependent_')}
+            member = {key: value for key, value in line.items() if not key.startswith('dependent_')}
+            if rows and member.get('national_id') and member['national_id'] == rows[-1].get('national_id'):
+                row = rows[-1]
+            else:
+                row = dict(member, dependents=[])
+                rows.append(row)
+                line_numbers.append(line_no)
+            if dependent.get('name'):
+                row['dependents'].append(dependent)
+        report = self.import_members(rows, chunk_size=chunk_size, create_users=create_users)
+        for line in report:
+            line['row'] = line_numbers[line['row'] - 1]
+        return report
+
+    # --------- Arrears engine ---------
+    @api.model
+    def _unpaid_invoice_domain(self, overdue_days=None, due_date_to=None):
+        """Domain on account.move for posted, unpaid customer invoices.
+
+        overdue_days: only invoices due (invoice_date_due, else invoice_date)
+                      more than this many days ago.
+        due_date_to:  only invoices with invoice_date_due on or before this date.
+        """
+        domain = [
+            ('move_type', '=', 'out_invoice'),
+            ('state', '=', 'posted'),
+            ('payment_state', '!=', 'paid'),
+            ('partner_id', '!=', False),
+        ]
+        if overdue_days is not None:
+            limit_date = fields.Date.today() - timedelta(days=overdue_days)
+            domain += [
+                '|',
+                ('invoice_date_due', '<', limit_date),
+                '&', ('invoice_date_due', '=', False), ('invoice_date', '<', limit_date),
+            ]
+        if due_date_to:
+            domain.append(('invoice_date_due', '<=', due_date_to))
+        return domain
+
+    @api.model
+    def _get_amount_due_by_partner(self, overdue_days=None, due_date_to=None, partner_ids=None):
+        """Return {partner_id: amount due} over the matching unpaid invoices, in one grouped query."""
+        domain = self._unpaid_invoice_domain(overdue_days=overdue_days, due_date_to=due_date_to)
+        if partner_ids is not None:
+            domain.append(('partner_id', 'in', partner_ids))
+        groups = self.env['account.move'].sudo()._read_group(
+            domain,
+            groupby=['partner_id'],
+            aggregates=['amount_residual:sum'],
+        )
+        return {partner.id: amount for partner, amount in groups}
+
+    @api.model
+    def _get_arrears_members(self, overdue_days=None, due_date_to=None, statuses=('active',)):
+        """Return the members owning at least one matching unpaid invoice.
+
+        Overdue partners are found with a single grouped query on account.move
+        and mapped back to members in bulk, instead of one search per member.
+        """
+        partner_ids = list(self._get_amount_due_by_partner(overdue_days=overdue_days, due_date_to=due_date_to))
+        if not partner_ids:
+            return self.browse()
+        domain = [('partner_id', 'in', partner_ids)]
+        if statuses:
+            domain.append(('status', 'in', list(statuses)))
+        return self.search(domain)
+
+    def _get_eligibility_snapshot(self):
+        """Return {member_id: {'tenure_met': bool, 'overdue_days': int}} for medical assistance.
+
+        tenure_met: member for at least 2 years (or no start date recorded).
+        overdue_days: days the oldest unpaid invoice is past due (0 if none).
+        Snapshots are computed in bulk and cached until the end of the transaction,
+        so validating many claims of the same members only costs one invoice query.
+        Pending invoice payment states are flushed first: recomputing them (e.g.
+        after a payment) drops the cache, and a member whose start date or
+        partner changed is computed again.
+        """
+        self.env['account.move'].flush_model(['payment_state'])
+        cache = self.env.cr.precommit.data.setdefault('shifa.eligibility_snapshot', {})
+        missing = self.filtered(
+            lambda m: cache.get(m.id, {}).get('key') != (m.membership_start_date, m.partner_id.id))
+        if missing:
+            today = fields.Date.today()
+            oldest_due = {}
+            if missing.partner_id:
+                invoices = self.env['account.move'].sudo().search_fetch([
+                    ('partner_id', 'in', missing.partner_id.ids),
+                    ('move_type', '=', 'out_invoice'),
+                    ('state', '=', 'posted'),
+                    ('payment_state', '!=', 'paid'),
+                ], ['partner_id', 'invoice_date_due', 'invoice_date'])
+                for inv in invoices:
+                    due = inv.invoice_date_due or inv.invoice_date
+                    if due and (inv.partner_id.id not in oldest_due or due < oldest_due[inv.partner_id.id]):
+                        oldest_due[inv.partner_id.id] = due
+            for member in missing:
+                start = member.membership_start_date
+                due = oldest_due.get(member.partner_id.id) if member.partner_id else None
+                cache[member.id] = {
+                    'tenure_met': not start or relativedelta(today, start).years >= 2,
+                    'overdue_days': max((today - due).days, 0) if due else 0,
+                    'key': (start, member.partner_id.id),
+                }
+        return {member.id: cache[member.id] for member in self}
+
+    # --------- CRON Jobs ---------
+    @api.model
+    @tracked_job('Suspend Members in Arrears')
+    def cron_suspend_arrears(self):
+        """Suspend active members with invoices overdue by more than 90 days."""
+        members_to_suspend = self._get_arrears_members(overdue_days=90)
+        self.env['shifa.job.run']._add_counts(scanned=len(members_to_suspend), changed=len(members_to_suspend))
         if members_to_suspend:
             members_to_suspend.write({'status': 'suspended'})
             # notify Treasurer and Secretary
             self._notify_committee_arrears(members_to_suspend)
 
     @api.model
-    def cron_yearly_renewal_invoicing(self):
-        """Generate yearly invoices (run each January 1)."""
+    @tracked_job('Refresh Member Payment State')
+    def cron_refresh_payment_state(self, batch_size=1000):
+        """Move members to 'arrears' once one of their invoices passes its due date.
+
+        payment_state only recomputes when an invoice changes, not when time
+        passes, so this selects the members whose unpaid invoices became due
+        since the previous run and recomputes them in batches.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
         today = fields.Date.today()
-        # Only run on January 1 to match requirement
-        if today.month == 1 and today.day == 1:
-            self.search([('status', '=', 'active')]).create_annual_invoice()
+        last_run = fields.Date.to_date(ICP.get_param('shifa.payment_state_refresh_date') or False)
+
+        domain = self._unpaid_invoice_domain()
+        if last_run:
+            domain += [
+                '|',
+                '&', ('invoice_date_due', '>=', last_run), ('invoice_date_due', '<', today),
+                '&', '&', ('invoice_date_due', '=', False),
+                ('invoice_date', '>=', last_run), ('invoice_date', '<', today),
+            ]
+        else:
+            domain += [
+                '|',
+                ('invoice_date_due', '<', today),
+                '&', ('invoice_date_due', '=', False), ('invoice_date', '<', today),
+            ]
+        groups = self.env['account.move']._read_group(domain, groupby=['partner_id'], aggregates=['__count'])
+        partner_ids = [partner.id for partner, _count in groups]
+        members = self.search([
+            ('partner_id', 'in', partner_ids),
+            ('payment_state', '!=', 'arrears'),
+        ]) if partner_ids else self.browse()
+
+        for batch in split_every(batch_size, members.ids, self.browse):
+            batch._refresh_payment_state()
+            batch.invalidate_recordset()
+
+        ICP.set_param('shifa.payment_state_refresh_date', fields.Date.to_string(today))
+        self.env['shifa.job.run']._add_counts(scanned=len(partner_ids), changed=len(members))
+        _logger.info("SHIFA: refreshed payment state of %s member(s)", len(members))
 
     @api.model
+    @tracked_job('Yearly Renewal Invoicing')
+    def cron_yearly_renewal_invoicing(self, chunk_size=500):
+        """Generate yearly invoices (run each January 1).
+
+        Members are invoiced in chunks ordered by id and the transaction is
+        committed after each chunk. The last invoiced member id is kept in the
+        'shifa.renewal_invoicing_progress' parameter ("<year>:<member id>"), so a
+        run interrupted on January 1 resumes where it stopped on the next call.
+        A failing chunk is retried member by member; members that still fail are
+        logged and skipped, so they do not block the members after them.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        today = fields.Date.today()
+        progress = ICP.get_param('shifa.renewal_invoicing_progress') or ''
+        year, _sep, last_id = progress.partition(':')
+        if year == str(today.year):
+            if last_id == 'done':
+                return
+            last_id = int(last_id or 0)
+        elif today.month == 1 and today.day == 1:
+            # Only start a new run on January 1 to match requirement
+            last_id = 0
+        else:
+            return
+
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        started = time.monotonic()
+        invoiced = 0
+        failed = []
+        while True:
+            members = self.search([('status', '=', 'active'), ('id', '>', last_id)], order='id', limit=chunk_size)
+            if not members:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    invoiced += len(members.create_annual_invoice())
+            except Exception:
+                # Retry the chunk member by member to isolate the failing ones
+                for member in members:
+                    try:
+                        with self.env.cr.savepoint():
+                            invoiced += len(member.create_annual_invoice())
+                    except Exception as e:
+                        _logger.exception("SHIFA: renewal invoicing failed for member %s (id %s)", member.name, member.id)
+                        self.env['shifa.job.run']._add_counts(
+                            message=f'Renewal invoicing failed for member {member.id}: {e}')
+                        failed.append(member.id)
+            last_id = members[-1].id
+            ICP.set_param('shifa.renewal_invoicing_progress', f'{today.year}:{last_id}')
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+        ICP.set_param('shifa.renewal_invoicing_progress', f'{today.year}:done')
+        elapsed = time.monotonic() - started
+        _logger.info(
+            "SHIFA: yearly renewal invoicing created %s invoice(s) in %.1fs (%.1f invoices/s), %s member(s) failed",
+            invoiced, elapsed, invoiced / elapsed if elapsed else 0.0, len(failed),
+        )
+
+    @api.model
+    @tracked_job('Check Dependent Ages')
     def cron_check_dependent_ages(self):
         """Dependents stay dependent at 18; can be kept up to 23 (if in education or care).
-           After 23 (and not care-dependent), unsubscribe but keep record."""
-        Dependents = self.env['shifa.dependent'].search([])
-        today = fields.Date.today()
-        for d in Dependents:
-            if not d.date_of_birth:
-                continue
-            age = (today - d.date_of_birth).days // 365
-            if age >= 23 and not d.is_care_dependent:
-                d.subscription_state = 'unsubscribed'
-            # NOTE: we keep them as dependents even after 18 per your rule.
+           After 23 (and not care-dependent), unsubscribe but keep record.
+           NOTE: we keep them as dependents even after 18 per your rule."""
+        due = self.env['shifa.dependent'].search([
+            ('age_transition_date', '<=', fields.Date.today()),
+            ('subscription_state', '!=', 'unsubscribed'),
+            ('is_care_dependent', '=', False),
+        ])
+        self.env['shifa.job.run']._add_counts(scanned=len(due), changed=len(due))
+        if due:
+            due.write({'subscription_state': 'unsubscribed'})
 
     @api.model
+    @tracked_job('Renewal Reminders')
     def cron_send_renewal_reminders(self):
-        """Send renewal reminders to members between Jan 1 and Mar 31 for unpaid invoices."""
+        """Queue renewal reminders to members between Jan 1 and Mar 31 for unpaid invoices.
+
+        Members reminded within the configured interval are skipped and at most
+        the configured number of mails is queued per run; the Treasurer gets
+        one digest of the run.
+        """
         today = fields.Date.today()
         if not (today.month >= 1 and today.month <= 3):
             return
-        # find active members with unpaid posted invoices
-        members = self.search([('status', '=', 'active')])
-        tmpl = self.env.ref('shifa.email_renewal_reminder', raise_if_not_found=False)
-        notified = self.browse()
-        for m in members:
-            if not m.partner_id:
-                continue
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', m.partner_id.id),
-                ('move_type', '=', 'out_invoice'),
-                ('state', '=', 'posted'),
-                ('payment_state', '!=', 'paid'),
-            ])
-            if invoices:
-                # send reminder
-                if tmpl:
-                    try:
-                        tmpl.sudo().send_mail(m.id, force_send=False)
-                    except Exception:
-                        pass
-                notified |= m
-
-        # Optionally send a summary to Treasurer
-        if notified:
-            summ_tmpl = self.env.ref('shifa.email_renewal_summary', raise_if_not_found=False)
-            if summ_tmpl:
-                try:
-                    # use first member as context; template should produce a list via server-side
-                    summ_tmpl.sudo().send_mail(notified[0].id, force_send=False)
-                except Exception:
-                    pass
+        amounts = self._get_amount_due_by_partner()
+        members = self.search([('status', '=', 'active'), ('partner_id', 'in', list(amounts))]) if amounts else self.browse()
+        batch = self.env['shifa.reminder']._enqueue_reminders(
+            members,
+            'renewal',
+            self.env.ref('shifa.email_renewal_reminder', raise_if_not_found=False),
+            digest_template=self.env.ref('shifa.email_renewal_summary', raise_if_not_found=False),
+            amounts={m.id: amounts.get(m.partner_id.id, 0.0) for m in members},
+        )
+        self.env['shifa.job.run']._add_counts(scanned=len(members), changed=batch.reminder_count)
 
     @api.model
+    @tracked_job('Post-March Suspension Check')
     def cron_post_march_suspension(self):
         """On and after Apr 1, suspend active members with unpaid invoices due by Mar 31."""
         today = fields.Date.today()
@@ -511,28 +1134,190 @@ class ShifaMember(models.Model):
         if today.month < 4:
             return
         cutoff = fields.Date.to_string(fields.Date.from_string(f"{today.year}-03-31"))
-        members_to_suspend = self.browse()
-        for m in self.search([('status', '=', 'active')]):
-            if not m.partner_id:
-                continue
-            invoices = self.env['account.move'].search([
-                ('partner_id', '=', m.partner_id.id),
-                ('move_type', '=', 'out_invoice'),
-                ('state', '=', 'posted'),
-                ('payment_state', '!=', 'paid'),
-                ('invoice_date_due', '<=', cutoff),
-            ])
-            if invoices:
-                members_to_suspend |= m
-
+        members_to_suspend = self._get_arrears_members(due_date_to=cutoff)
+        self.env['shifa.job.run']._add_counts(scanned=len(members_to_suspend), changed=len(members_to_suspend))
         if members_to_suspend:
             members_to_suspend.write({'status': 'suspended'})
             self._notify_committee_arrears(members_to_suspend)
 
     def action_download_membership_pdf(self):
-        """Download membership application PDF"""
+        """Download membership application PDF, served from the cached attachment.
+
+        A stale PDF is queued for the background renderer instead of being
+        rendered in the request.
+        """
+        self.ensure_one()
+        if not self._get_membership_pdf_attachments(render=False):
+            self._queue_membership_pdfs()
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Membership Application'),
+                    'message': _('The application PDF is being prepared, download it again in a few minutes.'),
+                    'type': 'warning',
+                },
+            }
         return {
             'type': 'ir.actions.act_url',
-            'url': f'/report/pdf/shifa.action_report_membership_application_pdf/{self.id}',
+            'url': f'/shifa/membership/pdf/{self.id}',
             'target': 'new',
         }
+
+    def action_download_committee_pack(self):
+        """Merge the application PDFs of the selected members into one document.
+
+        The pack is only built from cached PDFs: stale ones are queued for the
+        background renderer (cron_render_membership_pdfs) and the user is asked
+        to download the pack again once they are ready.
+        """
+        attachments = self._get_membership_pdf_attachments(render=False)
+        stale = self.filtered(lambda m: m.id not in attachments)
+        if stale:
+            self._queue_membership_pdfs()
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Committee Pack'),
+                    'message': _('%s application PDF(s) are being prepared, download the pack again in a few minutes.',
+                                 len(stale)),
+                    'type': 'warning',
+                },
+            }
+        pack = self.env['ir.attachment'].create({
+            'name': COMMITTEE_PACK_NAME % fields.Date.today(),
+            'raw': merge_pdf([attachments[rec.id].raw for rec in self]),
+            'mimetype': 'application/pdf',
+            'res_model': 'shifa.member',
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{pack.id}?download=true',
+            'target': 'new',
+        }
+
+    def _queue_membership_pdfs(self):
+        """Ask the background renderer to render the PDFs of these members next."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        queued = {int(member_id) for member_id in (ICP.get_param(MEMBERSHIP_PDF_QUEUE_PARAM) or '').split(',') if member_id}
+        ICP.set_param(MEMBERSHIP_PDF_QUEUE_PARAM, ','.join(map(str, sorted(queued | set(self.ids)))))
+        self.env.ref('shifa.ir_cron_render_membership_pdfs').sudo()._trigger()
+
+    def _get_membership_pdf_token(self):
+        """Token granting access to this member's application PDF (e.g. to the anonymous applicant)."""
+        self.ensure_one()
+        return tools.misc.hmac(self.env(su=True), 'shifa-membership-pdf', self.id)
+
+    def _get_membership_pdf_url(self):
+        self.ensure_one()
+        return f'/shifa/membership/pdf/{self.id}?access_token={self._get_membership_pdf_token()}'
+
+    @api.autovacuum
+    def _gc_committee_packs(self):
+        """Committee packs are one-off downloads: drop those older than a day."""
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'shifa.member'),
+            ('name', '=like', COMMITTEE_PACK_NAME % '%'),
+            ('create_date', '<', fields.Datetime.now() - timedelta(days=1)),
+        ]).unlink()
+
+    # --------- Membership PDF cache ---------
+    def _get_membership_pdf_keys(self):
+        """Return {member_id: cache key} built from the member's and its dependents' write_date."""
+        dependents = {
+            member.id: (count, last_write)
+            for member, count, last_write in self.env['shifa.dependent'].sudo()._read_group(
+                [('member_id', 'in', self.ids)], groupby=['member_id'], aggregates=['__count', 'write_date:max'],
+            )
+        }
+        keys = {}
+        for rec in self:
+            count, last_write = dependents.get(rec.id, (0, False))
+            keys[rec.id] = f'{rec.write_date}|{count}|{last_write}'
+        return keys
+
+    def _get_membership_pdf_attachments(self, render=True):
+        """Return {member_id: ir.attachment} of current application PDFs.
+
+        PDFs are cached as attachments whose description holds the cache key;
+        wkhtmltopdf only runs for members changed since their PDF was rendered
+        (or never rendered). With render=False, stale members are left out.
+        """
+        keys = self._get_membership_pdf_keys()
+        Attachment = self.env['ir.attachment'].sudo()
+        cached = {
+            att.res_id: att
+            for att in Attachment.search([
+                ('res_model', '=', 'shifa.member'),
+                ('res_id', 'in', self.ids),
+                ('name', '=like', MEMBERSHIP_PDF_NAME % '%'),
+            ])
+        }
+        report = self.env['ir.actions.report'].sudo().with_context(disable_javascript=True)
+        result = {}
+        for rec in self:
+            att = cached.get(rec.id)
+            if not (att and att.description == keys[rec.id]):
+                if not render:
+                    continue
+                pdf_content, _type = report._render_qweb_pdf(MEMBERSHIP_PDF_REPORT, res_ids=[rec.id])
+                vals = {'raw': pdf_content, 'description': keys[rec.id]}
+                if att:
+                    att.write(vals)
+                else:
+                    att = Attachment.create(dict(
+                        vals,
+                        name=MEMBERSHIP_PDF_NAME % rec.id,
+                        mimetype='application/pdf',
+                        res_model='shifa.member',
+                        res_id=rec.id,
+                    ))
+            result[rec.id] = att
+        return result
+
+    @api.model
+    def _get_stale_membership_pdf_members(self, limit):
+        """Draft and active members whose PDF is missing or older than their last change,
+        most recently changed first (at most `limit`)."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("""
+            SELECT m.id
+              FROM shifa_member m
+         LEFT JOIN ir_attachment a
+                ON a.res_model = 'shifa.member' AND a.res_id = m.id AND a.name = format(%(name)s, m.id)
+         LEFT JOIN LATERAL (
+                    SELECT MAX(write_date) AS write_date FROM shifa_dependent WHERE member_id = m.id
+                   ) d ON TRUE
+             WHERE m.status IN ('draft', 'active')
+               AND (a.id IS NULL OR a.write_date < GREATEST(m.write_date, d.write_date))
+          ORDER BY GREATEST(m.write_date, d.write_date) DESC, m.id DESC
+             LIMIT %(limit)s
+        """, name=MEMBERSHIP_PDF_NAME, limit=limit))
+        return self.browse([member_id for member_id, in self.env.cr.fetchall()])
+
+    @api.model
+    @tracked_job('Pre-render Membership PDFs')
+    def cron_render_membership_pdfs(self, limit=200):
+        """Pre-render stale application PDFs in the background so web requests are served from cache.
+
+        PDFs queued by _queue_membership_pdfs (asked for while stale) come first,
+        then the most recently changed stale members, selected in SQL.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        queued = self.browse([
+            int(member_id) for member_id in (ICP.get_param(MEMBERSHIP_PDF_QUEUE_PARAM) or '').split(',') if member_id
+        ]).exists()
+        current = queued._get_membership_pdf_attachments(render=False)
+        stale = queued.filtered(lambda m: m.id not in current)
+        left = stale[limit:]
+        stale = stale[:limit]
+        if len(stale) < limit:
+            stale |= self._get_stale_membership_pdf_members(limit - len(stale)) - queued
+        # The key check of _get_membership_pdf_attachments decides what is rendered
+        stale._get_membership_pdf_attachments()
+        ICP.set_param(MEMBERSHIP_PDF_QUEUE_PARAM, ','.join(map(str, left.ids)) or False)
+        self.env['shifa.job.run']._add_counts(scanned=len(queued | stale), changed=len(stale))
+        _logger.info("SHIFA: rendered %s membership PDF(s), %s queued left", len(stale), len(left))
+        if left:
+            self.env.ref('shifa.ir_cron_render_membership_pdfs').sudo()._trigger()
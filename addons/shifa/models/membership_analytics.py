@@ -0,0 +1,132 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+from .arrears_aging import PARTNER_MEMBER_QUERY
+from .job_run import tracked_job
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ShifaMembershipAnalytics(models.Model):
+    """Membership analytics cube: one row per member with its dependents,
+    fees and medical assistance, stored in a PostgreSQL materialized view.
+
+    Pivots and graphs read the precomputed rows instead of aggregating
+    members, dependents, invoices and claims on every click. Fees of a partner
+    shared by several members are counted once, on its representative member
+    (see PARTNER_MEMBER_QUERY). The view is refreshed concurrently (readers
+    are not blocked) by a cron, so figures are as of the last refresh.
+    """
+    _name = 'shifa.membership.analytics'
+    _description = 'SHIFA Membership Analytics'
+    _auto = False
+    _rec_name = 'member_id'
+    _order = 'admission_date desc, member_id'
+
+    member_id = fields.Many2one('shifa.member', string='Member', readonly=True)
+    admission_date = fields.Date(string='Admission Date', readonly=True)
+    category = fields.Selection(lambda self: self.env['shifa.member']._fields['category'].selection,
+                                readonly=True)
+    status = fields.Selection(lambda self: self.env['shifa.member']._fields['status'].selection,
+                              readonly=True)
+    payment_state = fields.Selection(lambda self: self.env['shifa.member']._fields['payment_state'].selection,
+                                     readonly=True)
+    currency_id = fields.Many2one('res.currency', readonly=True)
+    member_count = fields.Integer(string='Members', readonly=True)
+    dependent_count = fields.Integer(string='Dependents', readonly=True)
+    spouse_count = fields.Integer(string='Spouses', readonly=True)
+    child_count = fields.Integer(string='Children', readonly=True)
+    relative_count = fields.Integer(string='Care-dependent Relatives', readonly=True)
+    disabled_count = fields.Integer(string='Disabled Dependents', readonly=True)
+    fees_billed = fields.Monetary(string='Fees Billed', readonly=True)
+    fees_collected = fields.Monetary(string='Fees Collected', readonly=True)
+    fees_due = fields.Monetary(string='Fees Due', readonly=True)
+    claim_count = fields.Integer(string='Approved Claims', readonly=True)
+    medical_hospital = fields.Monetary(string='Hospital Paid', readonly=True)
+    medical_dental = fields.Monetary(string='Dental Paid', readonly=True)
+    medical_maternity = fields.Monetary(string='Maternity Paid', readonly=True)
+    medical_optical = fields.Monetary(string='Optical Paid', readonly=True)
+    medical_other = fields.Monetary(string='Other Paid', readonly=True)
+    medical_paid = fields.Monetary(string='Medical Assistance Paid', readonly=True)
+
+    @api.model
+    def _query(self):
+        return SQL("""
+            SELECT m.id AS id,
+                   m.id AS member_id,
+                   m.admission_date AS admission_date,
+                   m.category AS category,
+                   m.status AS status,
+                   m.payment_state AS payment_state,
+                   m.currency_id AS currency_id,
+                   1 AS member_count,
+                   COALESCE(d.dependent_count, 0) AS dependent_count,
+                   COALESCE(d.spouse_count, 0) AS spouse_count,
+                   COALESCE(d.child_count, 0) AS child_count,
+                   COALESCE(d.relative_count, 0) AS relative_count,
+                   COALESCE(d.disabled_count, 0) AS disabled_count,
+                   COALESCE(inv.fees_billed, 0) AS fees_billed,
+                   COALESCE(inv.fees_collected, 0) AS fees_collected,
+                   COALESCE(inv.fees_billed - inv.fees_collected, 0) AS fees_due,
+                   COALESCE(med.claim_count, 0) AS claim_count,
+                   COALESCE(med.medical_hospital, 0) AS medical_hospital,
+                   COALESCE(med.medical_dental, 0) AS medical_dental,
+                   COALESCE(med.medical_maternity, 0) AS medical_maternity,
+                   COALESCE(med.medical_optical, 0) AS medical_optical,
+                   COALESCE(med.medical_other, 0) AS medical_other,
+                   COALESCE(med.medical_paid, 0) AS medical_paid
+              FROM shifa_member m
+         LEFT JOIN (
+                    SELECT member_id,
+                           COUNT(*) AS dependent_count,
+                           COUNT(*) FILTER (WHERE relation = 'spouse') AS spouse_count,
+                           COUNT(*) FILTER (WHERE relation = 'child') AS child_count,
+                           COUNT(*) FILTER (WHERE relation = 'relative') AS relative_count,
+                           COUNT(*) FILTER (WHERE relation = 'disabled') AS disabled_count
+                      FROM shifa_dependent
+                  GROUP BY member_id
+                   ) d ON d.member_id = m.id
+         LEFT JOIN (%(partner_members)s) rep ON rep.id = m.id
+         LEFT JOIN (
+                    SELECT partner_id,
+                           SUM(amount_total_signed) AS fees_billed,
+                           SUM(amount_total_signed - amount_residual_signed) AS fees_collected
+                      FROM account_move
+                     WHERE move_type = 'out_invoice'
+                       AND state = 'posted'
+                       AND partner_id IN (SELECT partner_id FROM shifa_member WHERE partner_id IS NOT NULL)
+                  GROUP BY partner_id
+                   ) inv ON inv.partner_id = rep.partner_id
+         LEFT JOIN (
+                    SELECT member_id,
+                           COUNT(*) AS claim_count,
+                           SUM(approved_amount) FILTER (WHERE claim_type = 'hospital') AS medical_hospital,
+                           SUM(approved_amount) FILTER (WHERE claim_type = 'dental') AS medical_dental,
+                           SUM(approved_amount) FILTER (WHERE claim_type = 'maternity') AS medical_maternity,
+                           SUM(approved_amount) FILTER (WHERE claim_type = 'optical') AS medical_optical,
+                           SUM(approved_amount) FILTER (WHERE claim_type = 'other') AS medical_other,
+                           SUM(approved_amount) AS medical_paid
+                      FROM shifa_medical_assistance
+                     WHERE state = 'approved'
+                  GROUP BY member_id
+                   ) med ON med.member_id = m.id
+        """, partner_members=PARTNER_MEMBER_QUERY)
+
+    def init(self):
+        table = SQL.identifier(self._table)
+        self.env.cr.execute(SQL("DROP MATERIALIZED VIEW IF EXISTS %s", table))
+        self.env.cr.execute(SQL("CREATE MATERIALIZED VIEW %s AS (%s)", table, self._query()))
+        # REFRESH ... CONCURRENTLY needs a unique index
+        self.env.cr.execute(SQL("CREATE UNIQUE INDEX %s ON %s (id)", SQL.identifier(f'{self._table}_id_uniq'), table))
+        self.env.cr.execute(SQL("CREATE INDEX %s ON %s (admission_date)", SQL.identifier(f'{self._table}_admission_idx'), table))
+
+    @api.model
+    @tracked_job('Refresh Membership Analytics')
+    def cron_refresh(self):
+        """Refresh the cube without blocking the reports reading it."""
+        self.env.flush_all()
+        self.env.cr.execute(SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", SQL.identifier(self._table)))
+        self.invalidate_model()
+        self.env['ir.config_parameter'].sudo().set_param(
+            'shifa.membership_analytics_refresh_date', fields.Datetime.to_string(fields.Datetime.now()))
+        _logger.info("SHIFA: membership analytics refreshed")
@@ -0,0 +1,94 @@
+from odoo import api, fields, models
+from odoo.tools import SQL
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ShifaQueryAudit(models.AbstractModel):
+    """EXPLAIN the lookups the addon issues and report sequential scans.
+
+    Meant to be run from a shell against a database loaded with a large
+    (synthetic) dataset, e.g. env['shifa.query.audit'].run_audit().
+    """
+    _name = 'shifa.query.audit'
+    _description = 'SHIFA Query Plan Audit'
+
+    @api.model
+    def _get_audited_queries(self, sample_size=50):
+        """Return [(label, model, domain)] for the hot lookup paths of the addon."""
+        Member = self.env['shifa.member'].sudo()
+        members = Member.search([('partner_id', '!=', False)], limit=sample_size)
+        partner_ids = members.partner_id.ids or [0]
+        member_ids = members.ids or [0]
+        user_ids = members.user_id.ids or [0]
+        national_ids = [nid for nid in members.mapped('national_id') if nid] or ['']
+        today = fields.Date.today()
+        return [
+            ('arrears engine: invoices overdue > 90 days', 'account.move',
+             Member._unpaid_invoice_domain(overdue_days=90)),
+            ('renewal reminders: unpaid invoices', 'account.move',
+             Member._unpaid_invoice_domain()),
+            ('post-March suspension: unpaid invoices due by Mar 31', 'account.move',
+             Member._unpaid_invoice_domain(due_date_to=fields.Date.to_date(f'{today.year}-03-31'))),
+            ('payment state / eligibility: posted invoices of partners', 'account.move',
+             [('partner_id', 'in', partner_ids), ('move_type', '=', 'out_invoice'), ('state', '=', 'posted')]),
+            ('arrears engine: active members of partners', 'shifa.member',
+             [('partner_id', 'in', partner_ids), ('status', 'in', ['active'])]),
+            ('portal: member of user', 'shifa.member',
+             [('user_id', 'in', user_ids)]),
+            ('import: members by national ID', 'shifa.member',
+             [('national_id', 'in', national_ids)]),
+            ('renewal invoicing: active members by id', 'shifa.member',
+             [('status', '=', 'active'), ('id', '>', 0)]),
+            ('dependents of members', 'shifa.dependent',
+             [('member_id', 'in', member_ids)]),
+            ('dependent age transitions due', 'shifa.dependent',
+             [('age_transition_date', '<=', today), ('subscription_state', '!=', 'unsubscribed'),
+              ('is_care_dependent', '=', False)]),
+            ('medical claims of members', 'shifa.medical_assistance',
+             [('member_id', 'in', member_ids)]),
+            ('reminders sent recently', 'shifa.reminder',
+             [('member_id', 'in', member_ids), ('reminder_type', '=', 'renewal'),
+              ('reminder_date', '>=', fields.Datetime.now())]),
+        ]
+
+    @api.model
+    def _collect_seq_scans(self, plan, found):
+        if plan.get('Node Type') == 'Seq Scan':
+            found.append(plan.get('Relation Name'))
+        for child in plan.get('Plans', []):
+            self._collect_seq_scans(child, found)
+        return found
+
+    @api.model
+    def run_audit(self, analyze=False, force_index=False, sample_size=50):
+        """EXPLAIN every audited query and return one report line per query.
+
+        analyze:     use EXPLAIN ANALYZE (actually runs the queries).
+        force_index: disable sequential scans for the audit, so that a remaining
+                     Seq Scan means no usable index exists (handy on small data).
+        Each line is {'label', 'model', 'seq_scans', 'total_cost', 'plan'}.
+        """
+        report = []
+        with self.env.cr.savepoint(flush=False):
+            if force_index:
+                self.env.cr.execute("SET LOCAL enable_seqscan = off")
+            explain = SQL("EXPLAIN (ANALYZE, FORMAT JSON) ") if analyze else SQL("EXPLAIN (FORMAT JSON) ")
+            for label, model, domain in self._get_audited_queries(sample_size=sample_size):
+                query = self.env[model].sudo()._search(domain)
+                self.env.cr.execute(SQL("%s%s", explain, query.select()))
+                plan = self.env.cr.fetchone()[0][0]['Plan']
+                seq_scans = self._collect_seq_scans(plan, [])
+                report.append({
+                    'label': label,
+                    'model': model,
+                    'seq_scans': seq_scans,
+                    'total_cost': plan.get('Total Cost'),
+                    'plan': plan,
+                })
+                if seq_scans:
+                    _logger.warning("SHIFA query audit: %s scans %s sequentially", label, ', '.join(seq_scans))
+            if force_index:
+                self.env.cr.execute("RESET enable_seqscan")
+        return report
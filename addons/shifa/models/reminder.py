@@ -0,0 +1,106 @@
+from odoo import api, fields, models, _
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+REMINDER_TYPES = [
+    ('renewal', 'Renewal Reminder'),
+    ('arrears', 'Arrears Notification'),
+]
+
+
+class ShifaReminderBatch(models.Model):
+    _name = 'shifa.reminder.batch'
+    _description = 'SHIFA Reminder Batch'
+    _order = 'date desc, id desc'
+
+    name = fields.Char(required=True)
+    reminder_type = fields.Selection(REMINDER_TYPES, required=True, default='renewal')
+    date = fields.Datetime(default=fields.Datetime.now, required=True)
+    reminder_ids = fields.One2many('shifa.reminder', 'batch_id', string="Reminders")
+    reminder_count = fields.Integer(compute='_compute_reminder_count')
+    deferred_count = fields.Integer(string="Deferred (Send Cap)", help="Members left for the next run because the send cap was reached")
+
+    @api.depends('reminder_ids')
+    def _compute_reminder_count(self):
+        for rec in self:
+            rec.reminder_count = len(rec.reminder_ids)
+
+
+class ShifaReminder(models.Model):
+    """One reminder queued to one member; used to avoid reminding members again too soon."""
+    _name = 'shifa.reminder'
+    _description = 'SHIFA Reminder'
+    _order = 'reminder_date desc, id desc'
+
+    member_id = fields.Many2one('shifa.member', required=True, ondelete='cascade', index=True)
+    reminder_type = fields.Selection(REMINDER_TYPES, required=True, default='renewal')
+    reminder_date = fields.Datetime(default=fields.Datetime.now, required=True, index=True)
+    batch_id = fields.Many2one('shifa.reminder.batch', ondelete='cascade', index=True)
+    mail_id = fields.Many2one('mail.mail', string="Queued Mail", ondelete='set null')
+    currency_id = fields.Many2one(related='member_id.currency_id')
+    amount_due = fields.Monetary()
+
+    @api.model
+    def _enqueue_reminders(self, members, reminder_type, template, digest_template=None, amounts=None,
+                           email_values=None, throttle=True):
+        """Queue `template` for the given members and return the resulting batch.
+
+        Members already reminded of this type within the configured interval are
+        skipped, and no more than the configured send cap is queued; the rest is
+        left for the next run (throttle=False disables both). Mails are created
+        in bulk and sent by the mail queue. When `digest_template` is given, one
+        digest rendered on the batch is queued as well. `email_values` override
+        the values of every queued mail (e.g. the recipients).
+
+        A mail that cannot be queued raises: no reminder is recorded for a member
+        who was not notified, so the member is not skipped by the next run.
+        """
+        cfg = self.env['shifa.config'].sudo().get_settings()
+        interval = (cfg.reminder_interval_days if cfg else 7) if throttle else 0
+        send_cap = (cfg.reminder_send_cap if cfg else 0) if throttle else 0
+        amounts = amounts or {}
+
+        if members and interval:
+            since = fields.Datetime.now() - timedelta(days=interval)
+            recent = self._read_group([
+                ('member_id', 'in', members.ids),
+                ('reminder_type', '=', reminder_type),
+                ('reminder_date', '>=', since),
+            ], groupby=['member_id'])
+            members -= self.env['shifa.member'].browse([member.id for member, in recent])
+
+        deferred = 0
+        if send_cap and len(members) > send_cap:
+            deferred = len(members) - send_cap
+            members = members[:send_cap]
+        if not members:
+            return self.env['shifa.reminder.batch']
+
+        mail_by_member = {}
+        if template:
+            mails = template.sudo().send_mail_batch(members.ids, force_send=False, email_values=email_values)
+            mail_by_member = {mail.res_id: mail.id for mail in mails}
+            self.env['shifa.job.run']._add_counts(mails=len(mails))
+            members = members.filtered(lambda m: m.id in mail_by_member)
+            if not members:
+                return self.env['shifa.reminder.batch']
+
+        batch = self.env['shifa.reminder.batch'].create({
+            'name': _('%(type)s on %(date)s', type=dict(REMINDER_TYPES)[reminder_type], date=fields.Date.today()),
+            'reminder_type': reminder_type,
+            'deferred_count': deferred,
+        })
+        self.create([{
+            'member_id': member.id,
+            'reminder_type': reminder_type,
+            'batch_id': batch.id,
+            'mail_id': mail_by_member.get(member.id, False),
+            'amount_due': amounts.get(member.id, 0.0),
+        } for member in members])
+
+        if digest_template:
+            digest_template.sudo().send_mail(batch.id, force_send=False, email_values=email_values)
+            self.env['shifa.job.run']._add_counts(mails=1)
+        return batch
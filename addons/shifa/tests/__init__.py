@@ -0,0 +1,10 @@
+from . import test_member
+from . import test_medical_assistance
+from . import test_committee
+from . import test_meeting
+from . import test_portal
+from . import test_job_run
+from . import test_arrears_aging
+from . import test_membership_analytics
+from . import test_query_audit
+from . import test_performance
@@ -0,0 +1,98 @@
+from odoo import fields
+from odoo.tools import split_every
+from dateutil.relativedelta import relativedelta
+import random
+
+RELATIONS = ['spouse', 'child', 'child', 'child', 'relative', 'disabled']
+CLAIM_TYPES = ['hospital', 'dental', 'maternity', 'optical', 'other']
+
+
+class ShifaDataGenerator:
+    """Deterministic synthetic SHIFA data for benchmarks and query-plan audits.
+
+    The same seed and sizes always produce the same members, dependents,
+    invoices and claims (dates are relative to today). Records are created in
+    chunks with multi-creates, so 10k-100k members stay practical locally.
+    """
+
+    def __init__(self, env, seed=42, chunk_size=1000):
+        self.env = env
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+
+    def generate(self, members=1000, max_dependents=4, invoice_ratio=0.9, overdue_ratio=0.2, claim_ratio=0.05):
+        """Create the dataset and return the created shifa.member records.
+
+        invoice_ratio: share of active members with a posted renewal invoice.
+        overdue_ratio: share of those invoices due more than 90 days ago.
+        claim_ratio:   share of members with a (draft) medical claim.
+        """
+        Member = self.env['shifa.member'].with_context(tracking_disable=True, mail_create_nolog=True)
+        today = fields.Date.today()
+        rng = self.rng
+
+        created = Member.browse()
+        for chunk in split_every(self.chunk_size, range(members)):
+            created |= Member.create([{
+                'name': f'Synthetic Member {i:06d}',
+                'national_id': f'SYN{i:07d}',
+                'email': f'member{i:06d}@example.com',
+                'phone': f'5{i:07d}',
+                'date_of_birth': today - relativedelta(years=rng.randint(25, 80), days=rng.randint(0, 364)),
+                'status': rng.choices(['active', 'draft', 'suspended'], weights=[85, 10, 5])[0],
+                'admission_date': today - relativedelta(years=rng.randint(0, 20), days=rng.randint(0, 364)),
+                'membership_start_date': today - relativedelta(years=rng.randint(0, 20), days=rng.randint(0, 364)),
+            } for i in chunk])
+
+        dependent_vals = []
+        for member in created:
+            for _n in range(rng.randint(0, max_dependents)):
+                dependent_vals.append({
+                    'name': f'{member.name} Dependent {_n}',
+                    'relation': rng.choice(RELATIONS),
+                    'member_id': member.id,
+                    'date_of_birth': today - relativedelta(years=rng.randint(0, 30), days=rng.randint(0, 364)),
+                    'is_care_dependent': rng.random() < 0.05,
+                    'is_orphan': rng.random() < 0.02,
+                    'auto_promote': rng.random() < 0.5,
+                })
+        Dependent = self.env['shifa.dependent'].with_context(tracking_disable=True, mail_create_nolog=True)
+        for chunk in split_every(self.chunk_size, dependent_vals):
+            Dependent.create(list(chunk))
+
+        invoiced = created.filtered(lambda m: m.status == 'active' and rng.random() < invoice_ratio)
+        account = self.env['shifa.member']._get_income_account()
+        Move = self.env['account.move'].with_context(tracking_disable=True, mail_create_nolog=True)
+        for chunk in split_every(self.chunk_size, invoiced.ids, created.browse):
+            chunk._get_or_create_partner()
+            vals_list = []
+            for member in chunk:
+                overdue = rng.random() < overdue_ratio
+                due = today - relativedelta(days=rng.randint(91, 400)) if overdue else today + relativedelta(days=rng.randint(0, 90))
+                vals_list.append({
+                    'move_type': 'out_invoice',
+                    'partner_id': member.partner_id.id,
+                    'invoice_date': min(due, today),
+                    'invoice_date_due': due,
+                    'invoice_line_ids': [(0, 0, {
+                        'name': 'Annual Subscription', 'quantity': 1,
+                        'price_unit': member.annual_fee, 'account_id': account.id if account else False,
+                    })],
+                })
+            Move.create(vals_list).action_post()
+
+        # Claims only for members that pass the medical assistance eligibility rules
+        self.env.flush_all()
+        snapshots = created._get_eligibility_snapshot()
+        eligible = created.filtered(lambda m: snapshots[m.id]['tenure_met'] and snapshots[m.id]['overdue_days'] <= 90)
+        Claim = self.env['shifa.medical_assistance'].with_context(tracking_disable=True, mail_create_nolog=True)
+        claim_vals = [{
+            'member_id': member.id,
+            'claim_type': rng.choice(CLAIM_TYPES),
+            'claim_amount': rng.randint(1, 50) * 100.0,
+        } for member in eligible if rng.random() < claim_ratio]
+        for chunk in split_every(self.chunk_size, claim_vals):
+            Claim.create(list(chunk))
+
+        self.env.flush_all()
+        return created
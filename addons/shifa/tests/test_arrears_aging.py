@@ -0,0 +1,51 @@
+from odoo.tests.common import TransactionCase
+from odoo import fields
+from dateutil.relativedelta import relativedelta
+
+class TestShifaArrearsAging(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaArrearsAging, self).setUp()
+        self.Member = self.env['shifa.member']
+
+    def test_arrears_aging_buckets(self):
+        m = self.Member.create({'name': 'Aging User', 'email': 'aging@example.com', 'status': 'active'})
+        m._get_or_create_partner()
+        today = fields.Date.today()
+        for days, price in ((100, 100.0), (45, 40.0), (10, 10.0)):
+            inv = self.env['account.move'].create({
+                'move_type': 'out_invoice',
+                'partner_id': m.partner_id.id,
+                'invoice_date': today,
+                'invoice_date_due': today - relativedelta(days=days),
+                'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': price, 'tax_ids': []})],
+            })
+            inv.action_post()
+        self.env.flush_all()
+        line = self.env['shifa.arrears.aging'].search([('member_id', '=', m.id)])
+        self.assertEqual(line.invoice_count, 3)
+        self.assertEqual(line.overdue_days, 100)
+        self.assertAlmostEqual(line.amount_0_30, 10.0)
+        self.assertAlmostEqual(line.amount_31_90, 40.0)
+        self.assertAlmostEqual(line.amount_90_plus, 100.0)
+        self.assertAlmostEqual(line.amount_due, 150.0)
+
+    def test_aging_matches_arrears_engine(self):
+        # Invoices without a payment state are unpaid for the engine and the report alike
+        m = self.Member.create({'name': 'Unstated User', 'email': 'unstated@example.com', 'status': 'active'})
+        m._get_or_create_partner()
+        today = fields.Date.today()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': m.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today - relativedelta(days=100),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0, 'tax_ids': []})],
+        })
+        inv.action_post()
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE account_move SET payment_state = NULL WHERE id = %s", [inv.id])
+        inv.invalidate_recordset(['payment_state'])
+        self.assertIn(m, self.Member._get_arrears_members(overdue_days=90))
+        line = self.env['shifa.arrears.aging'].search([('member_id', '=', m.id)])
+        self.assertAlmostEqual(line.amount_90_plus, 100.0)
@@ -0,0 +1,34 @@
+from odoo.tests.common import TransactionCase
+from odoo import fields
+from dateutil.relativedelta import relativedelta
+
+class TestShifaCommittee(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaCommittee, self).setUp()
+        self.CommitteeMember = self.env['shifa.committee.member']
+        self.member = self.env['shifa.member'].create({'name': 'Committee User', 'status': 'active'})
+        self.role = self.env['shifa.committee.role'].create({'name': 'Treasurer'})
+
+    def test_tenure_check_is_idempotent(self):
+        today = fields.Date.today()
+        expired, current = self.CommitteeMember.create([
+            {'member_id': self.member.id, 'role_id': self.role.id, 'start_date': today - relativedelta(years=5)},
+            {'member_id': self.member.id, 'role_id': self.role.id, 'start_date': today - relativedelta(years=4)},
+        ])
+        self.assertEqual(expired.tenure_expiry_date, today)
+        self.CommitteeMember.check_expiration()
+        self.CommitteeMember.check_expiration()
+        self.assertEqual(len(expired.activity_ids), 1)
+        self.assertFalse(current.activity_ids)
+
+    def test_close_expired_tenures(self):
+        today = fields.Date.today()
+        expired, current = self.CommitteeMember.create([
+            {'member_id': self.member.id, 'role_id': self.role.id, 'start_date': today - relativedelta(years=6)},
+            {'member_id': self.member.id, 'role_id': self.role.id, 'start_date': today - relativedelta(years=1)},
+        ])
+        (expired | current).action_close_tenure()
+        self.assertFalse(expired.active)
+        self.assertEqual(expired.end_date, today - relativedelta(years=1))
+        self.assertTrue(current.active)
@@ -0,0 +1,43 @@
+from odoo.tests.common import TransactionCase
+from odoo import fields
+from dateutil.relativedelta import relativedelta
+
+class TestShifaJobRun(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaJobRun, self).setUp()
+        self.Member = self.env['shifa.member']
+        self.JobRun = self.env['shifa.job.run']
+
+    def test_cron_records_job_run(self):
+        self.env['shifa.config'].search([]).unlink()
+        self.env['shifa.config'].create({'committee_notification_emails': 'committee@example.com'})
+        m = self.Member.create({'name': 'Job Run User', 'email': 'jobrun@example.com', 'status': 'active'})
+        m._get_or_create_partner()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': m.partner_id.id,
+            'invoice_date': fields.Date.today(),
+            'invoice_date_due': fields.Date.today() - relativedelta(days=100),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        })
+        inv.action_post()
+        self.Member.cron_suspend_arrears()
+        # Written in the job's own transaction, visible to it
+        run = self.JobRun.search([('job_key', '=', 'shifa.member.cron_suspend_arrears')], limit=1)
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.records_changed, 1)
+        self.assertEqual(run.mails_queued, 1, "The committee digest is reported by the job")
+        self.assertGreater(run.query_count, 0)
+
+    def test_job_reports_its_own_mails(self):
+        members = self.Member.create([{
+            'name': 'Invited %s' % i, 'national_id': 'INV-%s' % i,
+            'email': 'invited%s@example.com' % i, 'status': 'draft',
+        } for i in range(2)])
+        runs_before = self.JobRun.search_count([])
+        members.action_approve()
+        self.assertEqual(self.JobRun.search_count([]), runs_before + 1)
+        run = self.JobRun.search([], limit=1)
+        self.assertEqual(run.job_key, 'shifa.member.action_approve')
+        self.assertEqual(run.mails_queued, 2, "One invitation per new website user")
@@ -0,0 +1,90 @@
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import AccessError, ValidationError
+from odoo import fields
+from dateutil.relativedelta import relativedelta
+
+class TestShifaMedicalAssistance(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaMedicalAssistance, self).setUp()
+        self.Claim = self.env['shifa.medical_assistance']
+        self.env['shifa.config'].search([]).unlink()
+        self.env['shifa.config'].create({'medical_fund_amount': 1000.0})
+        self.member = self.env['shifa.member'].create({
+            'name': 'Claimant',
+            'status': 'active',
+            'membership_start_date': fields.Date.today() - relativedelta(years=3),
+        })
+
+    def _claim(self, amount):
+        return self.Claim.create({'member_id': self.member.id, 'claim_amount': amount, 'approved_amount': amount})
+
+    def test_approval_updates_ledger(self):
+        self._claim(300.0).action_approve()
+        ledger = self.env['shifa.medical.fund.ledger'].search([('fiscal_year', '=', fields.Date.today().year)])
+        self.assertEqual(ledger.disbursed_amount, 300.0)
+
+    def test_batch_approval_respects_limit(self):
+        claims = self._claim(300.0) | self._claim(300.0)
+        with self.assertRaises(ValidationError):
+            claims.action_approve()
+        claims[0].action_approve()
+        with self.assertRaises(ValidationError):
+            claims[1].action_approve()
+
+    def test_approving_twice_counts_once(self):
+        claim = self._claim(200.0)
+        claim.action_approve()
+        (claim | self._claim(100.0)).action_approve()
+        ledger = self.env['shifa.medical.fund.ledger'].search([('fiscal_year', '=', fields.Date.today().year)])
+        self.assertEqual(ledger.disbursed_amount, 300.0)
+
+    def test_ledger_is_read_only_for_users(self):
+        self._claim(100.0).action_approve()
+        ledger = self.env['shifa.medical.fund.ledger'].search([('fiscal_year', '=', fields.Date.today().year)])
+        user = self.env['res.users'].create({
+            'name': 'Claims Clerk',
+            'login': 'claims_clerk',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        with self.assertRaises(AccessError):
+            ledger.with_user(user).write({'disbursed_amount': 0.0})
+        user.groups_id = [(4, self.env.ref('shifa.group_shifa_treasurer').id)]
+        ledger.with_user(user).write({'disbursed_amount': 100.0})
+
+    def _overdue_invoice(self):
+        self.member._get_or_create_partner()
+        today = fields.Date.today()
+        invoice = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': self.member.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today - relativedelta(days=100),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        })
+        invoice.action_post()
+        return invoice
+
+    def test_eligibility_refreshed_after_payment(self):
+        invoice = self._overdue_invoice()
+        self.assertEqual(self.member._get_eligibility_snapshot()[self.member.id]['overdue_days'], 100)
+        with self.assertRaises(ValidationError):
+            self._claim(100.0)
+        # Paying in the same transaction makes the member eligible again
+        self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoice.ids,
+        ).create({})._create_payments()
+        self.assertEqual(self.member._get_eligibility_snapshot()[self.member.id]['overdue_days'], 0)
+        self.assertTrue(self._claim(100.0))
+
+    def test_write_revalidates_only_on_member_or_approval(self):
+        claim = self._claim(100.0)
+        self._overdue_invoice()
+        # Editing the claim does not re-check the member
+        claim.write({'remarks': 'Receipts received'})
+        with self.assertRaises(ValidationError):
+            claim.write({'state': 'approved'})
+        other = self.env['shifa.member'].create({'name': 'Newcomer', 'status': 'active',
+                                                 'membership_start_date': fields.Date.today()})
+        with self.assertRaises(ValidationError):
+            claim.write({'member_id': other.id})
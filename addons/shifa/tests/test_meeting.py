@@ -0,0 +1,115 @@
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase, TransactionCase
+from odoo.exceptions import ValidationError
+import json
+
+class TestShifaMeeting(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaMeeting, self).setUp()
+        self.members = self.env['shifa.member'].create([
+            {'name': 'Voter %s' % i, 'status': 'active'} for i in range(4)
+        ])
+        self.meeting = self.env['shifa.meeting'].create({
+            'name': 'AGM',
+            'meeting_type': 'agm',
+            'attendee_ids': [(6, 0, self.members[:3].ids)],
+            'quorum_percent': 50.0,
+        })
+        self.poll = self.env['shifa.meeting.poll'].create({
+            'meeting_id': self.meeting.id,
+            'question': 'Approve the accounts?',
+        })
+
+    def test_ballots_and_frozen_results(self):
+        attendee_1, attendee_2, attendee_3, outsider = self.members
+        result = self.poll._record_votes([
+            (attendee_1.id, 'yes'),
+            (attendee_2.id, 'no'),
+            (outsider.id, 'yes'),      # not an attendee
+            (attendee_3.id, 'maybe'),  # invalid choice
+        ])
+        self.assertEqual(sorted(result['recorded']), sorted([attendee_1.id, attendee_2.id]))
+        self.assertEqual(result['rejected'], sorted([attendee_3.id, outsider.id]))
+        # A member votes only once
+        self.assertEqual(self.poll._record_votes([(attendee_1.id, 'no')])['recorded'], [])
+        self.assertEqual(self.poll.ballot_count, 2)
+
+        results = self.poll._get_results()[self.poll.id]
+        self.assertEqual((results['yes'], results['no'], results['attendees']), (1, 1, 3))
+        self.assertTrue(results['quorum_reached'])
+
+        self.poll.action_close()
+        self.assertEqual((self.poll.yes_count, self.poll.no_count, self.poll.abstain_count), (1, 1, 0))
+        self.assertEqual(self.poll.attendee_count, 3)
+        self.assertTrue(self.poll.quorum_reached)
+        with self.assertRaises(ValidationError):
+            self.poll._record_votes([(attendee_3.id, 'yes')])
+
+    def test_malformed_votes_are_rejected(self):
+        attendee = self.members[0]
+        result = self.poll._record_votes([('abc', 'yes'), (None, 'yes'), (2 ** 40, 'no'), (str(attendee.id), 'yes')])
+        self.assertEqual(result['recorded'], [attendee.id])
+        self.assertEqual(result['rejected'], ['abc', None, 2 ** 40])
+
+    def test_bulk_check_in(self):
+        active = self.env['shifa.member'].create([
+            {'name': 'Arriving %s' % i, 'status': 'active', 'national_id': 'AGM-%s' % i} for i in range(3)
+        ])
+        suspended = self.env['shifa.member'].create({'name': 'Suspended', 'status': 'suspended', 'national_id': 'AGM-S'})
+        meeting = self.env['shifa.meeting'].create({'name': 'AGM Check-in', 'meeting_type': 'agm'})
+        result = meeting._check_in_national_ids(['AGM-0', 'AGM-1', ' AGM-1 ', 'AGM-S', 'UNKNOWN'])
+        self.assertEqual(sorted(result['checked_in']), ['Arriving 0', 'Arriving 1'])
+        self.assertEqual([line['national_id'] for line in result['rejected']], ['AGM-S', 'UNKNOWN'])
+        result = meeting._check_in_national_ids(['AGM-1', 'AGM-2'])
+        self.assertEqual(result['checked_in'], ['Arriving 2'])
+        self.assertEqual(result['already'], ['Arriving 1'])
+        self.assertEqual(meeting.attendee_ids, active)
+        self.assertNotIn(suspended, meeting.attendee_ids)
+        self.assertEqual(meeting.attendance_count, 3)
+        self.assertEqual(meeting._get_attendance_status()['attendance'], 3)
+
+    def test_polls_share_the_meeting_quorum(self):
+        active = self.env['shifa.member'].search_count([('status', '=', 'active')])
+        self.meeting.quorum_percent = 100.0
+        status = self.meeting._get_attendance_status()
+        self.assertEqual(status['quorum_required'], active)
+        self.assertFalse(status['quorum_reached'])
+        self.assertFalse(self.poll._get_results()[self.poll.id]['quorum_reached'])
+        self.meeting.quorum_percent = 0.0
+        self.assertEqual(self.meeting._get_attendance_status()['quorum_required'], 0)
+
+
+@tagged('post_install', '-at_install')
+class TestShifaMeetingRoutes(HttpCase):
+
+    def setUp(self):
+        super(TestShifaMeetingRoutes, self).setUp()
+        self.member = self.env['shifa.member'].create({'name': 'Desk Voter', 'status': 'active'})
+        meeting = self.env['shifa.meeting'].create({'name': 'AGM Desk', 'meeting_type': 'agm',
+                                                    'attendee_ids': [(6, 0, self.member.ids)]})
+        self.poll = self.env['shifa.meeting.poll'].create({'meeting_id': meeting.id, 'question': 'Approve?'})
+        self.user = self.env['res.users'].create({
+            'name': 'Desk Clerk',
+            'login': 'desk_clerk',
+            'password': 'desk_clerk',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+
+    def _vote(self, votes):
+        response = self.url_open(
+            f'/shifa/meeting/poll/{self.poll.id}/vote',
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': {'votes': votes}}),
+            headers={'Content-Type': 'application/json'},
+        )
+        return response.json()
+
+    def test_batch_votes_need_secretary_or_treasurer(self):
+        self.authenticate('desk_clerk', 'desk_clerk')
+        votes = [{'member_id': self.member.id, 'choice': 'yes'}, {'member_id': 'abc', 'choice': 'yes'}]
+        self.assertIn('error', self._vote(votes), "Internal users cannot vote for other members")
+        self.assertFalse(self.poll.ballot_count)
+        self.user.groups_id = [(4, self.env.ref('shifa.group_shifa_secretary').id)]
+        result = self._vote(votes)['result']
+        self.assertEqual(result['recorded'], [self.member.id])
+        self.assertEqual(result['rejected'], ['abc'])
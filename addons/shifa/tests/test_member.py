@@ -1,5 +1,9 @@
 from odoo.tests.common import TransactionCase
 from odoo import fields
+from dateutil.relativedelta import relativedelta
+from freezegun import freeze_time
+from unittest.mock import patch
+from odoo.exceptions import UserError
 
 class TestShifaMember(TransactionCase):
 
@@ -34,3 +38,388 @@ class TestShifaMember(TransactionCase):
         m.cron_suspend_arrears()
         m.refresh()
         self.assertEqual(m.status, 'suspended')
+
+    def test_arrears_engine_overdue_threshold(self):
+        # An invoice just past due is unpaid but not yet 90 days overdue
+        today = fields.Date.today()
+        m = self.Member.create({'name': 'Recent User', 'email': 'recent@example.com', 'status': 'active'})
+        m._get_or_create_partner()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': m.partner_id.id,
+            'invoice_date': fields.Date.to_string(today),
+            'invoice_date_due': fields.Date.to_string(today - fields.timedelta(days=10)),
+            'invoice_line_ids': [(0,0,{'name':'Test','quantity':1,'price_unit':100.0})]
+        })
+        inv.action_post()
+        self.assertIn(m, self.Member._get_arrears_members())
+        self.assertNotIn(m, self.Member._get_arrears_members(overdue_days=90))
+
+    def test_annual_invoice_batch(self):
+        members = self.Member.create([
+            {'name': 'Batch One', 'email': 'one@example.com', 'status': 'active'},
+            {'name': 'Batch Two', 'email': 'two@example.com', 'status': 'active'},
+            {'name': 'Batch Draft', 'email': 'draft@example.com', 'status': 'draft'},
+        ])
+        invoices = members.create_annual_invoice()
+        self.assertEqual(len(invoices), 2, 'Only active members are invoiced')
+        self.assertTrue(all(inv.state == 'posted' for inv in invoices))
+        self.assertEqual(invoices.partner_id, members[:2].partner_id)
+
+    def test_reminder_queue_skips_recently_reminded(self):
+        members = self.Member.create([
+            {'name': 'Reminded One', 'email': 'r1@example.com', 'status': 'active'},
+            {'name': 'Reminded Two', 'email': 'r2@example.com', 'status': 'active'},
+        ])
+        Reminder = self.env['shifa.reminder']
+        tmpl = self.env.ref('shifa.email_renewal_reminder')
+        batch = Reminder._enqueue_reminders(members, 'renewal', tmpl)
+        self.assertEqual(batch.reminder_ids.member_id, members)
+        # Reminding again within the interval queues nothing
+        self.assertFalse(Reminder._enqueue_reminders(members, 'renewal', tmpl))
+
+    def test_renewal_reminders_send_treasurer_digest(self):
+        self.env.ref('shifa.group_shifa_treasurer').write({'users': [(5, 0, 0)]})
+        treasurer = self.env['res.users'].create({
+            'name': 'Renewal Treasurer',
+            'login': 'renewal_treasurer',
+            'email': 'renewal.treasurer@example.com',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id, self.env.ref('shifa.group_shifa_treasurer').id])],
+        })
+        year = fields.Date.today().year
+        member = self.Member.create({'name': 'Renewing User', 'email': 'renewing@example.com', 'status': 'active'})
+        member._get_or_create_partner()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': member.partner_id.id,
+            'invoice_date': f'{year}-01-05',
+            'invoice_date_due': f'{year}-01-10',
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        })
+        inv.action_post()
+        with freeze_time(f'{year}-02-15'):
+            self.Member.cron_send_renewal_reminders()
+        batch = self.env['shifa.reminder.batch'].search([('reminder_type', '=', 'renewal')])
+        self.assertEqual(batch.reminder_ids.member_id, member)
+        digest = self.env['mail.mail'].search([('model', '=', 'shifa.reminder.batch'), ('res_id', '=', batch.id)])
+        self.assertEqual(len(digest), 1)
+        self.assertEqual(digest.email_to, treasurer.email)
+
+    def test_dependent_age_transition(self):
+        today = fields.Date.today()
+        m = self.Member.create({'name': 'Parent User', 'email': 'parent@example.com', 'status': 'active'})
+        dep_over, dep_under = self.env['shifa.dependent'].create([
+            {'name': 'Turned 23', 'relation': 'spouse', 'member_id': m.id,
+             'date_of_birth': today - relativedelta(years=23)},
+            {'name': 'Turns 23 tomorrow', 'relation': 'spouse', 'member_id': m.id,
+             'date_of_birth': today - relativedelta(years=23) + relativedelta(days=1)},
+        ])
+        self.assertEqual(dep_over.age_transition_date, today)
+        self.Member.cron_check_dependent_ages()
+        self.assertEqual(dep_over.subscription_state, 'unsubscribed')
+        self.assertEqual(dep_under.subscription_state, 'active')
+
+    def test_bulk_import_reports_per_row(self):
+        self.Member.create({'name': 'Existing', 'national_id': 'N-EXIST'})
+        report = self.Member.import_members([
+            {'name': 'Imported', 'national_id': 'N-1', 'dependents': [{'name': 'Kid', 'relation': 'child'}]},
+            {'name': 'Existing Again', 'national_id': 'N-EXIST'},
+            {'name': 'Bad Date', 'national_id': 'N-2', 'date_of_birth': 'not-a-date'},
+            {'name': 'Repeated', 'national_id': 'N-1'},
+        ])
+        self.assertEqual([line['status'] for line in report], ['created', 'duplicate', 'error', 'duplicate'])
+        member = self.Member.browse(report[0]['member_id'])
+        self.assertEqual(member.dependent_ids.mapped('name'), ['Kid'])
+
+    def test_bulk_terminate_promotes_once(self):
+        promoting, declining = self.Member.create([
+            {'name': 'Promoting User', 'email': 'promoting@example.com', 'status': 'active'},
+            {'name': 'Declining User', 'email': 'declining@example.com', 'status': 'active'},
+        ])
+        spouse, child = self.env['shifa.dependent'].create([
+            {'name': 'Promoted Spouse', 'relation': 'spouse', 'member_id': promoting.id, 'auto_promote': True},
+            {'name': 'Declining Child', 'relation': 'child', 'member_id': declining.id},
+        ])
+        members = promoting | declining
+        members.action_terminate()
+        promoted = self.Member.search([('linked_member_id', '=', promoting.id)])
+        self.assertEqual(promoted.name, 'Promoted Spouse')
+        self.assertTrue(promoted.partner_id)
+        self.assertTrue(promoting.notification_sent)
+        self.assertEqual(child.subscription_state, 'unsubscribed')
+        mail = self.env['mail.mail'].search([('model', '=', 'shifa.member'), ('res_id', '=', promoted.id)])
+        self.assertEqual(mail.state, 'outgoing', "Notifications are queued, not sent in the transaction")
+        members.action_mark_deceased()
+        self.assertEqual(self.Member.search_count([('linked_member_id', '=', promoting.id)]), 1)
+
+    def test_arrears_digest_single_mail(self):
+        self.env['shifa.config'].search([]).unlink()
+        self.env['shifa.config'].create({'committee_notification_emails': 'committee@example.com'})
+        today = fields.Date.today()
+        members = self.Member.create([
+            {'name': 'Digest User %s' % i, 'email': 'digest%s@example.com' % i, 'status': 'active'}
+            for i in range(2)
+        ])
+        members._get_or_create_partner()
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': m.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today - relativedelta(days=100),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        } for m in members])
+        invoices.action_post()
+        self.Member.cron_suspend_arrears()
+        batch = self.env['shifa.reminder.batch'].search([('reminder_type', '=', 'arrears')])
+        self.assertEqual(batch.reminder_count, 2)
+        mails = self.env['mail.mail'].search([('model', '=', 'shifa.reminder.batch'), ('res_id', '=', batch.id)])
+        self.assertEqual(len(mails), 1, "The committee gets one digest for the whole run")
+        self.assertEqual(mails.email_to, 'committee@example.com')
+        self.assertFalse(self.env['mail.mail'].search_count([('model', '=', 'shifa.member'), ('res_id', 'in', members.ids),
+                                                              ('subject', 'ilike', 'arrears')]))
+
+    def test_dependent_eligibility_batch(self):
+        today = fields.Date.today()
+        m = self.Member.create({'name': 'Large Family', 'email': 'family@example.com', 'status': 'active'})
+        deps = self.env['shifa.dependent'].create([
+            {'name': 'Child %s' % i, 'relation': 'child', 'member_id': m.id,
+             'date_of_birth': today - relativedelta(years=25 + i)}
+            for i in range(3)
+        ] + [
+            {'name': 'Young Child', 'relation': 'child', 'member_id': m.id,
+             'date_of_birth': today - relativedelta(years=10)},
+            {'name': 'Cared For', 'relation': 'child', 'member_id': m.id, 'is_care_dependent': True,
+             'date_of_birth': today - relativedelta(years=30)},
+        ])
+        over_age, young, cared = deps[:3], deps[3], deps[4]
+        self.assertEqual(set(over_age.mapped('subscription_state')), {'unsubscribed'})
+        self.assertEqual(set(over_age.mapped('approval_state')), {'rejected'})
+        self.assertEqual(young.subscription_state, 'active')
+        self.assertEqual(cared.subscription_state, 'active')
+        # Dropping the care flag re-validates; approved dependents are unsubscribed but stay approved
+        cared.approval_state = 'approved'
+        cared.is_care_dependent = False
+        self.assertEqual(cared.subscription_state, 'unsubscribed')
+        self.assertEqual(cared.approval_state, 'approved')
+
+    def test_dependent_age_group_refresh(self):
+        today = fields.Date.today()
+        m = self.Member.create({'name': 'Age Group Parent', 'email': 'agegroup@example.com', 'status': 'active'})
+        dep = self.env['shifa.dependent'].create({
+            'name': 'Turns 14 tomorrow', 'relation': 'child', 'member_id': m.id,
+            'date_of_birth': today - relativedelta(years=14) + relativedelta(days=1),
+        })
+        self.assertEqual(dep.age_group, 'under_14')
+        self.assertEqual(dep.next_age_group_date, today + relativedelta(days=1))
+        with freeze_time(today + relativedelta(days=1)):
+            self.env['shifa.dependent'].cron_refresh_age_groups()
+        self.assertEqual(dep.age_group, '14_18')
+        self.assertEqual(dep.next_age_group_date, dep.date_of_birth + relativedelta(years=18))
+        groups = self.env['shifa.dependent']._read_group([('member_id', '=', m.id)], ['age_group'], ['__count'])
+        self.assertEqual(groups, [('14_18', 1)])
+
+    def test_partner_resolver_reuses_matches(self):
+        first = self.Member.create({'name': 'Returning User', 'national_id': 'RES-1',
+                                    'email': 'returning@example.com', 'phone': '+230 5123 4567'})
+        first._get_or_create_partner()
+        reapplication, same_contact, family = self.Member.create([
+            # Same national ID: the partner is reused whatever the contact details
+            {'name': 'Returning User', 'national_id': 'RES-1', 'email': 'new-address@example.com'},
+            # Same person without national ID, phone written differently
+            {'name': 'returning user ', 'phone': '23051234567'},
+            # Family member sharing the email gets a partner of its own
+            {'name': 'Returning Spouse', 'email': 'Returning@Example.com'},
+        ])
+        partner_count = self.partner_model.search_count([])
+        (reapplication | same_contact | family)._get_or_create_partner()
+        self.assertEqual(reapplication.partner_id, first.partner_id)
+        self.assertEqual(same_contact.partner_id, first.partner_id)
+        self.assertNotEqual(family.partner_id, first.partner_id)
+        self.assertEqual(self.partner_model.search_count([]), partner_count + 1)
+
+    def test_refresh_payment_state_window(self):
+        # payment_state is not recomputed when an invoice falls due; the cron picks it up
+        today = fields.Date.today()
+        m = self.Member.create({'name': 'Falling Due', 'email': 'falling@example.com', 'status': 'active'})
+        m._get_or_create_partner()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': m.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today + relativedelta(days=1),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        })
+        inv.action_post()
+        self.Member.cron_refresh_payment_state()
+        self.assertEqual(m.payment_state, 'pending', "The invoice is not due yet")
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertEqual(ICP.get_param('shifa.payment_state_refresh_date'), fields.Date.to_string(today))
+        with freeze_time(today + relativedelta(days=2)):
+            self.Member.cron_refresh_payment_state()
+            self.assertEqual(m.payment_state, 'arrears')
+            self.assertEqual(ICP.get_param('shifa.payment_state_refresh_date'),
+                             fields.Date.to_string(today + relativedelta(days=2)))
+
+    def test_renewal_invoicing_resumes_and_skips_failures(self):
+        today = fields.Date.today()
+        members = self.Member.create([
+            {'name': 'Renewal %s' % i, 'email': 'renewal%s@example.com' % i, 'status': 'active'} for i in range(4)
+        ])
+        done, first, failing, last = members
+        ICP = self.env['ir.config_parameter'].sudo()
+        # A previous run stopped after the first member
+        ICP.set_param('shifa.renewal_invoicing_progress', f'{today.year}:{done.id}')
+
+        prepare = type(self.Member)._prepare_annual_invoice_vals
+
+        def prepare_or_fail(records, account, due_date):
+            if failing in records:
+                raise ValueError("Cannot invoice this member")
+            return prepare(records, account, due_date)
+
+        with patch.object(type(self.Member), '_prepare_annual_invoice_vals', prepare_or_fail), \
+                self.assertLogs('odoo.addons.shifa.models.member', level='ERROR'):
+            self.Member.cron_yearly_renewal_invoicing(chunk_size=2)
+        invoiced = self.env['account.move'].search([
+            ('partner_id', 'in', members.partner_id.ids), ('move_type', '=', 'out_invoice'),
+        ]).partner_id
+        self.assertEqual(invoiced, (first | last).partner_id, "The failing member does not block the next chunk")
+        self.assertEqual(ICP.get_param('shifa.renewal_invoicing_progress'), f'{today.year}:done')
+        # A finished run does nothing more
+        self.Member.cron_yearly_renewal_invoicing(chunk_size=2)
+        self.assertEqual(self.env['account.move'].search_count([('partner_id', 'in', members.partner_id.ids)]), 2)
+
+    def test_stored_counters_recompute(self):
+        m = self.Member.create({'name': 'Counter User', 'email': 'counter@example.com', 'status': 'active',
+                                'entry_fee': 500.0, 'annual_fee': 1000.0, 'dependent_fee': 200.0})
+        self.assertEqual((m.dependent_count, m.invoice_count, m.total_fee), (0, 0, 1500.0))
+        spouse, child = self.env['shifa.dependent'].create([
+            {'name': 'Counter Spouse', 'relation': 'spouse', 'member_id': m.id},
+            {'name': 'Counter Child', 'relation': 'child', 'member_id': m.id},
+        ])
+        self.assertEqual(m.dependent_count, 2)
+        self.assertEqual(m.total_fee, 1900.0)
+        m.create_annual_invoice()
+        self.assertEqual(m.invoice_count, 1)
+        child.unlink()
+        m.dependent_fee = 300.0
+        self.assertEqual((m.dependent_count, m.total_fee), (1, 1800.0))
+        # The stored values are searchable
+        self.assertEqual(self.Member.search([('id', '=', m.id), ('invoice_count', '>', 0), ('dependent_count', '=', 1)]), m)
+
+    def test_reminder_not_recorded_when_mail_fails(self):
+        member = self.Member.create({'name': 'Unreachable', 'email': 'unreachable@example.com', 'status': 'active'})
+        broken = self.env['mail.template'].create({
+            'name': 'Broken Reminder',
+            'model_id': self.env['ir.model']._get_id('shifa.member'),
+            'subject': '{{ object.no_such_field }}',
+            'body_html': '<p>Reminder</p>',
+        })
+        Reminder = self.env['shifa.reminder']
+        with self.assertRaises(UserError):
+            Reminder._enqueue_reminders(member, 'renewal', broken)
+        self.assertFalse(Reminder.search([('member_id', '=', member.id)]))
+        # The member is reminded by the next run that can queue the mail
+        batch = Reminder._enqueue_reminders(member, 'renewal', self.env.ref('shifa.email_renewal_reminder'))
+        self.assertTrue(batch.reminder_ids.mail_id)
+
+    def test_committee_pack_queues_stale_pdfs(self):
+        members = self.Member.create([{'name': 'Pack %s' % i, 'status': 'draft'} for i in range(2)])
+        action = members.action_download_committee_pack()
+        self.assertEqual(action['tag'], 'display_notification', "Stale PDFs are not rendered in the request")
+        queued = self.env['ir.config_parameter'].sudo().get_param('shifa.membership_pdf_requested')
+        self.assertEqual(queued, ','.join(map(str, members.ids)))
+        self.assertNotEqual(members[0]._get_membership_pdf_token(), members[1]._get_membership_pdf_token())
+
+    def test_membership_pdf_rendered_in_background(self):
+        member, other = self.Member.create([{'name': 'Applicant %s' % i, 'status': 'draft'} for i in range(2)])
+        action = member.action_download_membership_pdf()
+        self.assertEqual(action['tag'], 'display_notification', "A stale PDF is not rendered in the request")
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertEqual(ICP.get_param('shifa.membership_pdf_requested'), str(member.id))
+        self.assertIn(other, self.Member._get_stale_membership_pdf_members(limit=1000))
+
+        self.Member.cron_render_membership_pdfs(limit=1)
+        self.assertFalse(ICP.get_param('shifa.membership_pdf_requested'))
+        self.assertIn(member.id, member._get_membership_pdf_attachments(render=False), "Queued PDFs come first")
+        self.assertNotIn(member, self.Member._get_stale_membership_pdf_members(limit=1000))
+        self.assertEqual(member.action_download_membership_pdf()['type'], 'ir.actions.act_url')
+
+    def test_approve_provisions_website_users(self):
+        mailed, offline = self.Member.create([
+            {'name': 'Approved Online', 'national_id': 'WEB-1', 'email': 'online@example.com', 'status': 'draft'},
+            {'name': 'Approved Offline', 'national_id': 'WEB-2', 'status': 'draft'},
+        ])
+        (mailed | offline).action_approve()
+        self.assertEqual(mailed.user_id.login, 'WEB-1')
+        self.assertEqual(offline.user_id.login, 'WEB-2')
+        self.assertIn(self.env.ref('shifa.group_website_member'), mailed.user_id.groups_id)
+        mail = self.env['mail.mail'].search([('model', '=', 'shifa.member'), ('res_id', '=', mailed.id),
+                                             ('subject', '=', 'Your SHIFA website account')])
+        self.assertEqual(mail.state, 'outgoing', "The invitation is queued by mail")
+        self.assertIn('/web/signup', mail.body_html)
+        self.assertNotIn('Password', mail.body_html, "No password is mailed")
+        self.assertFalse(self.env['mail.mail'].search_count([('model', '=', 'shifa.member'), ('res_id', '=', offline.id),
+                                                              ('subject', '=', 'Your SHIFA website account')]))
+
+    def test_committee_recipients_follow_groups(self):
+        self.env['shifa.config'].search([]).unlink()
+        Config = self.env['shifa.config']
+        treasurer = self.env.ref('shifa.group_shifa_treasurer')
+        secretary = self.env.ref('shifa.group_shifa_secretary')
+        (treasurer | secretary).write({'users': [(5, 0, 0)]})
+        self.assertFalse(Config._get_committee_emails())
+
+        member = self.Member.create({'name': 'Unnotified', 'email': 'unnotified@example.com', 'status': 'suspended'})
+        with self.assertLogs('odoo.addons.shifa.models.member', level='WARNING'):
+            self.Member._notify_committee_arrears(member)
+        self.assertFalse(self.env['shifa.reminder'].search([('member_id', '=', member.id)]),
+                         "Nothing is queued without recipients")
+
+        user = self.env['res.users'].create({
+            'name': 'New Treasurer',
+            'login': 'new_treasurer',
+            'email': 'treasurer@example.com',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        self.assertFalse(Config._get_committee_emails())
+        user.groups_id = [(4, treasurer.id)]
+        self.assertEqual(Config._get_committee_emails(), 'treasurer@example.com')
+        user.groups_id = [(3, treasurer.id)]
+        self.assertFalse(Config._get_committee_emails())
+
+    def test_shared_partner_counted_once(self):
+        former = self.Member.create({'name': 'Shared User', 'national_id': 'SHR-1',
+                                     'email': 'shared@example.com', 'status': 'terminated'})
+        former._get_or_create_partner()
+        current = self.Member.create({'name': 'Shared User', 'national_id': 'SHR-1', 'status': 'active'})
+        current._get_or_create_partner()
+        self.assertEqual(current.partner_id, former.partner_id)
+        today = fields.Date.today()
+        inv = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': current.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today - relativedelta(days=10),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0, 'tax_ids': []})],
+        })
+        inv.action_post()
+        self.env.flush_all()
+        members = former | current
+        lines = self.env['shifa.arrears.aging'].search([('member_id', 'in', members.ids)])
+        self.assertEqual(lines.member_id, current, "The invoice is aged on the active member only")
+        self.assertAlmostEqual(lines.amount_due, 100.0)
+
+        Analytics = self.env['shifa.membership.analytics']
+        Analytics.cron_refresh()
+        rows = Analytics.search([('member_id', 'in', members.ids)])
+        self.assertEqual(len(rows), 2)
+        self.assertAlmostEqual(sum(rows.mapped('fees_billed')), 100.0)
+        self.assertAlmostEqual(sum(rows.mapped('fees_due')), 100.0)
+
+    def test_partner_resolver_ignores_non_member_contacts(self):
+        vendor = self.partner_model.create({'name': 'Contact User', 'email': 'contact@example.com'})
+        m = self.Member.create({'name': 'Contact User', 'email': 'contact@example.com'})
+        m._get_or_create_partner()
+        self.assertTrue(m.partner_id)
+        self.assertNotEqual(m.partner_id, vendor)
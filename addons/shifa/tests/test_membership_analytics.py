@@ -0,0 +1,21 @@
+from odoo.tests.common import TransactionCase
+
+class TestShifaMembershipAnalytics(TransactionCase):
+
+    def setUp(self):
+        super(TestShifaMembershipAnalytics, self).setUp()
+        self.Member = self.env['shifa.member']
+
+    def test_membership_analytics_refresh(self):
+        m = self.Member.create({'name': 'Cube User', 'email': 'cube@example.com', 'status': 'active'})
+        self.env['shifa.dependent'].create([
+            {'name': 'Cube Spouse', 'relation': 'spouse', 'member_id': m.id},
+            {'name': 'Cube Child', 'relation': 'child', 'member_id': m.id},
+        ])
+        Analytics = self.env['shifa.membership.analytics']
+        Analytics.cron_refresh()
+        row = Analytics.search([('member_id', '=', m.id)])
+        self.assertEqual(row.member_count, 1)
+        self.assertEqual(row.dependent_count, 2)
+        self.assertEqual(row.spouse_count, 1)
+        self.assertEqual(row.child_count, 1)
@@ -0,0 +1,153 @@
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase, TransactionCase
+from .common import ShifaDataGenerator
+from odoo.addons.shifa.models.member import _portal_summaries
+from freezegun import freeze_time
+from datetime import date
+import json
+import logging
+import os
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Size of the benchmark dataset; raise it locally, e.g.
+#   SHIFA_BENCH_MEMBERS=100000 odoo -d shifa_bench -i shifa --test-tags /shifa:shifa_benchmark --stop-after-init
+BENCH_MEMBERS = int(os.environ.get('SHIFA_BENCH_MEMBERS', 200))
+# Optional path of a JSON file the timings are appended to
+BENCH_OUTPUT = os.environ.get('SHIFA_BENCH_OUTPUT')
+# Size of the dataset of the query budgets run with the regular tests
+BUDGET_MEMBERS = 30
+
+
+class ShifaBenchmarkMixin:
+
+    @classmethod
+    def _generate_dataset(cls):
+        started = time.monotonic()
+        cls.members = ShifaDataGenerator(cls.env).generate(members=BENCH_MEMBERS)
+        _logger.info("SHIFA benchmark: generated %s members in %.1fs", BENCH_MEMBERS, time.monotonic() - started)
+
+    def _benchmark(self, label, func, *args, **kwargs):
+        """Run func, log and record its wall time and SQL query count, return its result."""
+        self.env.flush_all()
+        queries_before = self.env.cr.sql_log_count
+        started = time.monotonic()
+        result = func(*args, **kwargs)
+        self.env.flush_all()
+        elapsed = time.monotonic() - started
+        queries = self.env.cr.sql_log_count - queries_before
+        _logger.info("SHIFA benchmark [%s members] %s: %.3fs, %s queries", BENCH_MEMBERS, label, elapsed, queries)
+        if BENCH_OUTPUT:
+            with open(BENCH_OUTPUT, 'a') as f:
+                f.write(json.dumps({
+                    'members': BENCH_MEMBERS, 'label': label, 'seconds': round(elapsed, 3), 'queries': queries,
+                }) + '\n')
+        return result
+
+
+@tagged('post_install', '-at_install')
+class TestShifaQueryBudget(TransactionCase):
+    """Query counts of the hot lookups on a small synthetic dataset.
+
+    The budgets do not depend on the number of members: a change that
+    reintroduces a per-member query makes them fail.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.members = ShifaDataGenerator(cls.env).generate(members=BUDGET_MEMBERS)
+        cls.Member = cls.env['shifa.member']
+
+    def test_arrears_engine_budget(self):
+        with self.assertQueryCount(3):
+            members = self.Member._get_arrears_members(overdue_days=90)
+        self.assertTrue(members, "The synthetic dataset has overdue members")
+
+    def test_eligibility_snapshot_budget(self):
+        self.env.cr.precommit.data.pop('shifa.eligibility_snapshot', None)
+        members = self.members.browse(self.members.ids)
+        with self.assertQueryCount(4):
+            members._get_eligibility_snapshot()
+
+    def test_membership_pdf_keys_budget(self):
+        members = self.members.browse(self.members.ids)
+        with self.assertQueryCount(3):
+            members._get_membership_pdf_keys()
+
+    def test_dependent_ages_budget(self):
+        # First run handles the due dependents; an up-to-date run is the dependent
+        # search plus the insert of its job run
+        self.Member.cron_check_dependent_ages()
+        self.env.flush_all()
+        with self.assertQueryCount(2):
+            self.Member.cron_check_dependent_ages()
+
+    def test_profile_summary_budget(self):
+        # Building the summary is bounded, and a cached summary only costs the version lookup
+        member = self.members.filtered('partner_id')[:1]
+        _portal_summaries.clear()
+        with self.assertQueryCount(12):
+            member._get_portal_summary()
+        with self.assertQueryCount(3):
+            member._get_portal_summary()
+
+
+@tagged('-standard', 'post_install', '-at_install', 'shifa_benchmark')
+class TestShifaPerformance(ShifaBenchmarkMixin, TransactionCase):
+    """Wall time of the crons on a large synthetic dataset (see BENCH_MEMBERS)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._generate_dataset()
+        cls.Member = cls.env['shifa.member']
+
+    def test_cron_suspend_arrears(self):
+        self._benchmark('cron_suspend_arrears', self.Member.cron_suspend_arrears)
+        self.assertFalse(self.Member._get_arrears_members(overdue_days=90))
+
+    def test_cron_post_march_suspension(self):
+        # The cron only acts from April on
+        with freeze_time(f'{date.today().year}-04-15'):
+            self._benchmark('cron_post_march_suspension', self.Member.cron_post_march_suspension)
+
+    def test_cron_refresh_payment_state(self):
+        self._benchmark('cron_refresh_payment_state', self.Member.cron_refresh_payment_state)
+
+    def test_create_annual_invoice(self):
+        active = self.members.filtered(lambda m: m.status == 'active')
+        invoices = self._benchmark('create_annual_invoice', active.create_annual_invoice)
+        self.assertEqual(len(invoices), len(active))
+
+    def test_cron_check_dependent_ages(self):
+        self._benchmark('cron_check_dependent_ages', self.Member.cron_check_dependent_ages)
+
+    def test_query_audit(self):
+        report = self._benchmark('query_audit', self.env['shifa.query.audit'].run_audit, force_index=True)
+        for line in report:
+            self.assertFalse(line['seq_scans'], f"{line['label']} has no usable index")
+
+
+@tagged('-standard', 'post_install', '-at_install', 'shifa_benchmark')
+class TestShifaRoutePerformance(ShifaBenchmarkMixin, HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._generate_dataset()
+        cls.member = cls.members.filtered(lambda m: m.status == 'active' and m.partner_id)[:1]
+        cls.member.email = False  # keep the password instead of mailing it
+        cls.member._create_website_user()
+        cls.member.user_id.password = 'shifa-bench'
+
+    def test_profile_route(self):
+        self.authenticate(self.member.national_id, 'shifa-bench')
+        response = self._benchmark('/shifa/profile (cold)', self.url_open, '/shifa/profile')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get('ETag')
+        response = self._benchmark('/shifa/profile (cached)', self.url_open, '/shifa/profile')
+        self.assertEqual(response.status_code, 200)
+        response = self._benchmark('/shifa/profile (304)', self.url_open, '/shifa/profile', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
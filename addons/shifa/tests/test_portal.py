@@ -0,0 +1,32 @@
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase
+
+
+@tagged('post_install', '-at_install')
+class TestShifaPortal(HttpCase):
+
+    def setUp(self):
+        super(TestShifaPortal, self).setUp()
+        self.member = self.env['shifa.member'].create({'name': 'Portal User', 'national_id': 'PORTAL-1', 'status': 'active'})
+        self.member._create_website_user()
+        self.member.user_id.password = 'shifa-portal'
+
+    def test_summary_version_and_cache(self):
+        member = self.member
+        version, summary = member._get_portal_summary()
+        self.assertIs(member._get_portal_summary()[1], summary, "The same version is served from the cache")
+        self.env['shifa.dependent'].create({'name': 'Portal Child', 'relation': 'child', 'member_id': member.id})
+        new_version, new_summary = member._get_portal_summary()
+        self.assertNotEqual(new_version, version)
+        self.assertEqual([dep['name'] for dep in new_summary['dependents']], ['Portal Child'])
+
+    def test_summary_etag(self):
+        self.authenticate('PORTAL-1', 'shifa-portal')
+        url = '/shifa/profile/summary.json'
+        response = self.url_open(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            self.assertEqual(self.url_open(url, headers={'If-None-Match': header}).status_code, 304, header)
+        for header in ('"other"', etag[:-2] + '"'):
+            self.assertEqual(self.url_open(url, headers={'If-None-Match': header}).status_code, 200, header)
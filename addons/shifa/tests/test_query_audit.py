@@ -0,0 +1,30 @@
+from odoo.tests.common import TransactionCase
+from odoo import fields
+from dateutil.relativedelta import relativedelta
+
+class TestShifaQueryAudit(TransactionCase):
+
+    def test_lookups_use_indexes(self):
+        today = fields.Date.today()
+        member = self.env['shifa.member'].create({'name': 'Audited User', 'national_id': 'AUDIT-1', 'status': 'active'})
+        member._get_or_create_partner()
+        invoice = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': member.partner_id.id,
+            'invoice_date': today,
+            'invoice_date_due': today - relativedelta(days=100),
+            'invoice_line_ids': [(0, 0, {'name': 'Test', 'quantity': 1, 'price_unit': 100.0})],
+        })
+        invoice.action_post()
+        self.env.flush_all()
+        Audit = self.env['shifa.query.audit']
+        report = Audit.run_audit(force_index=True)
+        self.assertEqual(len(report), len(Audit._get_audited_queries()))
+        for line in report:
+            self.assertFalse(line['seq_scans'], f"{line['label']} has no usable index")
+
+    def test_unpaid_invoice_index_predicate(self):
+        self.env.cr.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'shifa_account_move_unpaid_due_idx'")
+        indexdef = self.env.cr.fetchone()[0]
+        self.assertIn('(invoice_date_due, partner_id)', indexdef)
+        self.assertIn("'paid'", indexdef)